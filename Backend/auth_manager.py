@@ -7,59 +7,53 @@ import os
 import sys
 import uuid
 import random
-import bcrypt
-import psycopg2
 from datetime import datetime, timedelta
 from dotenv import dotenv_values
 
 # === Local Helpers ===
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-from jarvis_db import get_user_by_name
+from jarvis_db import (
+    get_user_identity, invalidate_user, find_login_user,
+    update_session_login, update_session_logout
+)
+from db_pool import db_connection
 from Backend.email_sender import send_otp_email
+from Backend.password_pool import hash_password, verify_password, needs_rehash
 
 # === Load .env Variables ===
-DB_PARAMS = {
-    "dbname": os.environ.get("PG_DB"),
-    "user": os.environ.get("PG_USER"),
-    "password": os.environ.get("PG_PASS"),
-    "host": os.environ.get("PG_HOST"),
-    "port": os.environ.get("PG_PORT", "5432")
-}
-
 ADMIN_USERNAME = os.environ.get("ADMIN_USERNAME")
 ADMIN_PASSWORD = os.environ.get("ADMIN_PASSWORD")
 ADMIN_EMAIL = os.environ.get("ADMIN_EMAIL")
 
 # ============================================
-# DB Utilities
-# ============================================
-
-def connect_db():
-    return psycopg2.connect(**DB_PARAMS)
-
-# ============================================
-# Password Hashing
+# Password Hashing (see password_pool.py)
 # ============================================
 
-def hash_password(password):
-    return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
-
-def verify_password(password, hashed):
-    return bcrypt.checkpw(password.encode(), hashed.encode())
+def rehash_if_needed(user_id, password, stored_password):
+    # Transparently upgrade hashes made with an old BCRYPT_ROUNDS
+    if not needs_rehash(stored_password):
+        return
+    try:
+        new_hash = hash_password(password)
+        with db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("UPDATE users SET password = %s WHERE id = %s", (new_hash, user_id))
+    except Exception as e:
+        print(f"⚠️ Password rehash skipped: {e}")
 
 # ============================================
 # User Management
 # ============================================
 
 def user_exists(username):
-    return get_user_by_name(username) is not None
+    return get_user_identity(username) is not None
 
 def save_user(email, username, password):
+    hashed_pw = hash_password(password)
     try:
-        with connect_db() as conn:
+        with db_connection() as conn:
             with conn.cursor() as cursor:
                 user_id = str(uuid.uuid4())
-                hashed_pw = hash_password(password)
                 cursor.execute("""
                     INSERT INTO users (id, email, username, password, created_at)
                     VALUES (%s, %s, %s, %s, %s)
@@ -72,38 +66,32 @@ def save_user(email, username, password):
     except Exception as e:
         print(f"❌ Error saving user: {e}")
         return False
+    finally:
+        invalidate_user(username)
 
 def fetch_user(username):
-    with connect_db() as conn:
+    with db_connection() as conn:
         with conn.cursor() as cursor:
             cursor.execute("SELECT id, password FROM users WHERE username = %s", (username,))
             return cursor.fetchone()
 
 def set_active_user(user_id, username):
-    with connect_db() as conn:
-        with conn.cursor() as cursor:
-            cursor.execute("""
-                INSERT INTO sessions (user_id, username, logged_in, last_login)
-                VALUES (%s, %s, 1, %s)
-                ON CONFLICT (username) DO UPDATE SET logged_in = 1, last_login = EXCLUDED.last_login
-            """, (user_id, username, datetime.now()))
+    update_session_login(username, user_id)
 
 def clear_active_user(username):
-    with connect_db() as conn:
-        with conn.cursor() as cursor:
-            cursor.execute("UPDATE sessions SET logged_in = 0 WHERE username = %s", (username,))
+    update_session_logout(username)
 
 def get_active_user():
-    with connect_db() as conn:
+    with db_connection() as conn:
         with conn.cursor() as cursor:
             cursor.execute("SELECT username FROM sessions WHERE logged_in = 1 ORDER BY last_login DESC LIMIT 1")
             result = cursor.fetchone()
             return result[0] if result else None
 
 def email_exists(email):
-    with connect_db() as conn:
+    with db_connection() as conn:
         with conn.cursor() as cursor:
-            cursor.execute("SELECT 1 FROM users WHERE email = %s", (email,))
+            cursor.execute("SELECT 1 FROM users WHERE lower(email) = lower(%s)", (email,))
             return cursor.fetchone() is not None
 
 # ============================================
@@ -114,7 +102,7 @@ def generate_otp():
     return str(random.randint(100000, 999999))
 
 def store_otp(username, otp):
-    with connect_db() as conn:
+    with db_connection() as conn:
         with conn.cursor() as cursor:
             cursor.execute("""
                 INSERT INTO otp_reset (username, otp, created_at)
@@ -123,7 +111,7 @@ def store_otp(username, otp):
             """, (username, otp, datetime.now()))
 
 def verify_otp(username, otp):
-    with connect_db() as conn:
+    with db_connection() as conn:
         with conn.cursor() as cursor:
             cursor.execute("""
                 SELECT created_at FROM otp_reset WHERE username = %s AND otp = %s
@@ -138,10 +126,11 @@ def verify_otp_flow(username, otp):
     return verify_otp(username, otp)
 
 def update_password(username, new_password):
-    with connect_db() as conn:
+    hashed_pw = hash_password(new_password)
+    with db_connection() as conn:
         with conn.cursor() as cursor:
-            hashed_pw = hash_password(new_password)
             cursor.execute("UPDATE users SET password = %s WHERE username = %s", (hashed_pw, username))
+    invalidate_user(username)
 
 # ============================================
 # Signup / Login / Logout
@@ -167,25 +156,21 @@ def login_flow(identifier, password):
     if is_admin_login(identifier, password):
         return True, "admin"
 
-    # Else, check user DB
-    with connect_db() as conn:
-        with conn.cursor() as cursor:
-            cursor.execute("SELECT id, username, password FROM users WHERE username = %s", (identifier,))
-            user = cursor.fetchone()
-
-            if not user:
-                cursor.execute("SELECT id, username, password FROM users WHERE email = %s", (identifier,))
-                user = cursor.fetchone()
-                if not user:
-                    return False, "❌ Username or email not found."
+    # Else, check user DB (username or email in one indexed query)
+    user = find_login_user(identifier)
+    if not user:
+        return False, "❌ Username or email not found."
 
-            user_id, username, stored_password = user
+    user_id, username, stored_password = user
 
-            if verify_password(password, stored_password):
-                set_active_user(user_id, username)
-                return True, username
+    # bcrypt runs on the password pool with the connection already returned;
+    # HasherBusy propagates so the route can answer 503.
+    if verify_password(password, stored_password):
+        rehash_if_needed(user_id, password, stored_password)
+        set_active_user(user_id, username)
+        return True, username
 
-            return False, "❌ Incorrect password."
+    return False, "❌ Incorrect password."
 
 def logout_flow(username):
     clear_active_user(username)
@@ -197,7 +182,7 @@ def logout_flow(username):
 # ============================================
 
 def forgot_password_flow(username):
-    user = get_user_by_name(username)
+    user = get_user_identity(username)
     if not user:
         print("❌ Username does not exist.")
         return False
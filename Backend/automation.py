@@ -5,74 +5,93 @@ import webbrowser
 from flask import session
 from datetime import datetime
 from dotenv import dotenv_values
-from groq import Groq
+from Backend.llm_clients import GROQ_API_KEY
+from Backend.llm_provider import chat_llm, use_stub
+from Backend.metrics import timed, timed_stream
 
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-from jarvis_db import get_user_by_name, save_user_file
+from jarvis_db import get_user_identity, save_user_file
 
 
 
 # === Load environment variables ===
 env = dotenv_values(".env")
 
-GroqAPIKey = os.environ.get("GROQ_API_KEY")
+
+# === Content Writer Helpers ===
+def build_content_messages(prompt):
+    Username = session.get("username", "User")
+    return [
+        {
+            "role": "system",
+            "content": f"Hello, I am {Username}. You're a content writer. You have to write content like letters, codes, applications, essays, notes, songs, poems etc."
+        },
+        {
+            "role": "user",
+            "content": prompt
+        }
+    ]
+
+def save_generated_content(prompt, answer):
+    # Safe filename
+    safe_name = re.sub(r'[^a-zA-Z0-9_-]', '_', prompt.lower())
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    filename = f"{safe_name}_{timestamp}.txt"
+
+    # Save to DB
+    user_id = session.get("user_id")
+    if not user_id:
+        user = get_user_identity(session.get("username", "User"))
+        if not user:
+            return "❌ Error: User not found in database."
+        user_id = user["id"]
+
+    save_user_file(user_id, filename, answer)
+
+    return f"✅ Content generated! <a href='/download/{filename}' target='_blank'>Download here</a>"
 
 # === PostgreSQL-backed AI Content Writer ===
+@timed("content")
 def WriteContent(prompt):
     try:
-        if not GroqAPIKey:
+        if not GROQ_API_KEY and not use_stub():
             return "❌ Groq API Key not found."
 
-        # Load current username from session
-        Username = session.get("username", "User")
-
-        # Construct message context
-        messages = [
-            {
-                "role": "system",
-                "content": f"Hello, I am {Username}. You're a content writer. You have to write content like letters, codes, applications, essays, notes, songs, poems etc."
-            },
-            {
-                "role": "user",
-                "content": prompt
-            }
-        ]
-
-        # Generate content using Groq
-        client = Groq(api_key=GroqAPIKey)
-        completion = client.chat.completions.create(
-            model="llama3-70b-8192",
-            messages=messages,
-            max_tokens=2048,
-            temperature=0.7,
-            top_p=1,
-            stream=False
-        )
-
-        # Extract answer
-        choice = completion.choices[0]
-        message = getattr(choice, "message", None)
-        answer = message.content if message else str(choice)
+        # Generate content using the configured provider
+        answer = chat_llm().complete(build_content_messages(prompt), purpose="content", max_tokens=2048, temperature=0.7)
         answer = answer.replace("</s>", "")
 
-        # Safe filename
-        safe_name = re.sub(r'[^a-zA-Z0-9_-]', '_', prompt.lower())
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        filename = f"{safe_name}_{timestamp}.txt"
+        return save_generated_content(prompt, answer)
 
-        # Save to DB
-        user = get_user_by_name(Username)
-        if not user:
-            return "❌ Error: User not found in database."
+    except Exception as e:
+        return f"❌ Error using Groq API: {e}"
 
-        user_id = user["id"]
-        save_user_file(user_id, filename, answer)
 
-        return f"✅ Content generated! <a href='/download/{filename}' target='_blank'>Download here</a>"
+# === Streaming Content Writer ===
+# Yields the document as it is written, then the download link; returns the
+# link as the final answer (use `answer = yield from WriteContentStream(prompt)`).
+@timed_stream("content_stream")
+def WriteContentStream(prompt):
+    try:
+        if not GROQ_API_KEY and not use_stub():
+            error = "❌ Groq API Key not found."
+            yield error
+            return error
+
+        answer = ""
+        for delta in chat_llm().stream(build_content_messages(prompt), purpose="content", max_tokens=2048, temperature=0.7):
+            answer += delta
+            yield delta
+
+        result = save_generated_content(prompt, answer.replace("</s>", ""))
+        yield f"\n\n{result}"
+        return result
 
     except Exception as e:
-        return f"❌ Error using Groq API: {e}"
+        error = f"❌ Error using Groq API: {e}"
+        yield error
+        return error
 
 
 # === Open Website Helper ===
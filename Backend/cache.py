@@ -0,0 +1,172 @@
+# ============================================
+# File: cache.py
+# Description: Thread-safe in-process LRU/TTL cache with an optional shared (Redis) tier
+# ============================================
+
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+
+# === Load .env Variables ===
+REDIS_URL = os.environ.get("REDIS_URL")
+
+_MISSING = object()
+
+
+class TTLCache:
+    """LRU cache whose entries also expire after `ttl` seconds."""
+
+    def __init__(self, maxsize=1024, ttl=300, name="cache", shared=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self.shared = shared
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "shared_hits": 0}
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires = entry
+                if expires > now:
+                    self._data.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return value
+                del self._data[key]
+
+        if self.shared is not None:
+            value = self.shared.get(f"{self.name}:{key}")
+            if value is not _MISSING:
+                self._store(key, value, self.ttl)
+                with self._lock:
+                    self.stats["shared_hits"] += 1
+                return value
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return default
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        self._store(key, value, ttl)
+        if self.shared is not None:
+            self.shared.set(f"{self.name}:{key}", value, ttl)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+        if self.shared is not None:
+            self.shared.delete(f"{self.name}:{key}")
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def _store(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def __len__(self):
+        return len(self._data)
+
+    def snapshot(self):
+        with self._lock:
+            data = dict(self.stats)
+            data["size"] = len(self._data)
+        lookups = data["hits"] + data["shared_hits"] + data["misses"]
+        data["hit_rate"] = (data["hits"] + data["shared_hits"]) / lookups if lookups else 0.0
+        return data
+
+
+# ============================================
+# Optional Shared Tier
+# ============================================
+
+class RedisBackend:
+    """JSON-serialising Redis tier; failures degrade to in-process caching only."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def get(self, key):
+        try:
+            raw = self.client.get(key)
+            return json.loads(raw) if raw is not None else _MISSING
+        except Exception as e:
+            print(f"⚠️ Shared cache read failed: {e}")
+            return _MISSING
+
+    def set(self, key, value, ttl):
+        try:
+            self.client.set(key, json.dumps(value), ex=max(1, int(ttl)))
+        except Exception as e:
+            print(f"⚠️ Shared cache write failed: {e}")
+
+    def delete(self, key):
+        try:
+            self.client.delete(key)
+        except Exception as e:
+            print(f"⚠️ Shared cache delete failed: {e}")
+
+
+def shared_backend():
+    """Return a RedisBackend when REDIS_URL is set and redis is installed, else None."""
+    if not REDIS_URL:
+        return None
+    try:
+        import redis
+    except ImportError:
+        print("⚠️ REDIS_URL is set but the redis package is not installed; using in-process cache only.")
+        return None
+    return RedisBackend(redis.Redis.from_url(REDIS_URL))
+
+
+# ============================================
+# Single-flight Deduplication
+# ============================================
+
+class SingleFlight:
+    """Collapse concurrent calls for the same key into one upstream call."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.stats = {"leaders": 0, "followers": 0}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = {"event": threading.Event(), "result": None, "error": None}
+                self._calls[key] = call
+                leader = True
+                self.stats["leaders"] += 1
+            else:
+                leader = False
+                self.stats["followers"] += 1
+
+        if not leader:
+            call["event"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"]
+
+        try:
+            call["result"] = fn()
+            return call["result"]
+        except Exception as e:
+            call["error"] = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call["event"].set()
@@ -1,36 +1,21 @@
-# === File: chatbot.py (PostgreSQL Only + .env) ===
+# === File: chatbot.py (.env config; DB access goes through db_pool) ===
 
-from groq import Groq
+from Backend.llm_provider import chat_llm
+from Backend.metrics import timed, timed_stream
+from Backend.semantic_cache import semantic_cache, enabled_for
+from Backend.memory import conversation_memory, MEMORY_ENABLED
+from jarvis_db import get_user_identity
 from flask import session
 from dotenv import dotenv_values
 import datetime
 import os
-import psycopg2
 
 # === Load Environment Variables from .env ===
 
 Assistantname = os.environ.get("ASSISTANTNAME", "Jarvis")
-GroqAPIKey = os.environ.get("GROQ_API_KEY")
-
-PG_DB = os.environ.get("PG_DB")
-PG_USER = os.environ.get("PG_USER")
-PG_PASS = os.environ.get("PG_PASS")
-PG_HOST = os.environ.get("PG_HOST")
-PG_PORT = os.environ.get("PG_PORT", "5432")
-
-
-# === Initialize Groq Client ===
-client = Groq(api_key=GroqAPIKey)
-
-# === PostgreSQL Connection ===
-def get_pg_conn():
-    return psycopg2.connect(
-        dbname=PG_DB,
-        user=PG_USER,
-        password=PG_PASS,
-        host=PG_HOST,
-        port=PG_PORT
-    )
+
+
+# === LLM Provider (Groq or local stub, see llm_provider.py) ===
 
 # === System Prompt Generator ===
 def build_system_prompt():
@@ -59,28 +44,47 @@ def RealtimeInformation():
 def AnswerModifier(Answer):
     return '\n'.join([line for line in Answer.split('\n') if line.strip()])
 
+# === Message Context (system prompt, conversation memory, query) ===
+# Also returns whether memory (history or summary) was added, i.e. whether
+# the answer may depend on what this user said before.
+def build_chat_context(query):
+    user_id = session.get("user_id")
+    history = conversation_memory.context_messages(user_id) if MEMORY_ENABLED and user_id else []
+    return [
+        {"role": "system", "content": build_system_prompt()},
+        {"role": "system", "content": RealtimeInformation()},
+        *history,
+        {"role": "user", "content": query}
+    ], bool(history)
+
+# === Semantic Cache (opt-in, see semantic_cache.py) ===
+def cache_user():
+    user = get_user_identity(session.get("username"))
+    return user if enabled_for(user) else None
+
+def cache_answer(user, query, answer, personalized):
+    # Answers shaped by the asker's memory or addressing them by name are not
+    # shared with other users
+    if user and not personalized and user["username"].lower() not in answer.lower():
+        semantic_cache.store(query, answer)
+
 # === Main Chat Interface ===
+@timed("chat")
 def Chat(query):
     try:
-        username = session.get("username")
-        context = [
-            {"role": "system", "content": build_system_prompt()},
-            {"role": "system", "content": RealtimeInformation()},
-            {"role": "user", "content": query}
-        ]
+        user = cache_user()
+        if user:
+            cached = semantic_cache.lookup(query)
+            if cached is not None:
+                return cached
+
+        context, personalized = build_chat_context(query)
 
         # === Get AI Response ===
-        completion = client.chat.completions.create(
-            model="llama3-70b-8192",
-            messages=context,
-            max_tokens=1024,
-            temperature=0.7,
-            top_p=1,
-            stream=False
-        )
-
-        answer = completion.choices[0].message.content.replace("</s>", "")
+        answer = chat_llm().complete(context, purpose="chat", max_tokens=1024, temperature=0.7)
+        answer = answer.replace("</s>", "")
         answer = AnswerModifier(answer)
+        cache_answer(user, query, answer, personalized)
 
         # ✅ Do not store chat here anymore (already done in app.py)
         return answer
@@ -88,3 +92,31 @@ def Chat(query):
     except Exception as e:
         print(f"[Chatbot Error] {e}")
         return "❌ Sorry, something went wrong while processing your request."
+
+# === Streaming Chat Interface ===
+# Yields text deltas as Groq produces them and returns the cleaned answer
+# (use `answer = yield from ChatStream(query)`).
+@timed_stream("chat_stream")
+def ChatStream(query):
+    answer = ""
+    try:
+        user = cache_user()
+        if user:
+            cached = semantic_cache.lookup(query)
+            if cached is not None:
+                yield cached
+                return cached
+
+        context, personalized = build_chat_context(query)
+        for delta in chat_llm().stream(context, purpose="chat", max_tokens=1024, temperature=0.7):
+            answer += delta
+            yield delta
+        answer = AnswerModifier(answer.replace("</s>", ""))
+        cache_answer(user, query, answer, personalized)
+        return answer
+
+    except Exception as e:
+        print(f"[Chatbot Error] {e}")
+        error = "❌ Sorry, something went wrong while processing your request."
+        yield error
+        return error
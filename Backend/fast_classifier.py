@@ -0,0 +1,123 @@
+# ============================================
+# File: fast_classifier.py
+# Description: Deterministic keyword/regex pre-classifier for FirstLayerDMM
+# ============================================
+
+import os
+import re
+import json
+import threading
+from datetime import datetime
+
+# === Load .env Variables ===
+# "on"     -> confident local decisions skip Cohere
+# "shadow" -> always ask Cohere, log local vs remote decisions for offline comparison
+# "off"    -> local classifier disabled
+FASTPATH_MODE = os.environ.get("DMM_FASTPATH", "on").lower()
+FASTPATH_LOG = os.environ.get("DMM_FASTPATH_LOG", "Data/dmm_shadow.jsonl")
+
+# === Clause Rules (first match wins; anything unmatched is ambiguous) ===
+GREETINGS = re.compile(
+    r"^(hi|hello|hey|hii+|yo|good (morning|afternoon|evening|night)|how are you|"
+    r"how are you doing|what's up|whats up|thanks|thank you|ok|okay)[\s!.?]*$"
+)
+# open/close/play only take a one- or two-word target, and none of its words
+# may be conversational ("open up about...", "play a game", "open source");
+# longer or chattier clauses are left to Cohere.
+TARGET = r"([\w.-]{1,30}(?: [\w.-]{1,30})?)"
+NON_TARGET_WORDS = {
+    "a", "an", "the", "this", "that", "it", "up", "me", "my", "your", "you", "us", "our",
+    "some", "something", "about", "with", "to", "for", "and", "or", "of", "in", "on",
+    "source", "minded", "ended", "enough", "game", "games", "around", "along", "again",
+}
+
+def _target_rule(verb):
+    pattern = re.compile(rf"^{verb}\s+{TARGET}$")
+    def build(m):
+        if NON_TARGET_WORDS.intersection(m.group(1).split()):
+            return None
+        return f"{verb} {m.group(1)}"
+    return pattern, build
+
+RULES = [
+    (re.compile(r"^(bye|goodbye|exit|quit)[\s!.]*$"), lambda m: "exit"),
+    (re.compile(r"^(?:google search|search google for)\s+(.+)$"), lambda m: f"google search {m.group(1)}"),
+    (re.compile(r"^(?:youtube search|search youtube for|search on youtube)\s+(.+)$"), lambda m: f"youtube search {m.group(1)}"),
+    _target_rule("play"),
+    _target_rule("open"),
+    _target_rule("close"),
+]
+CLAUSE_SPLIT = re.compile(r"\s*(?:,|\band then\b|\band\b)\s*")
+
+# === Hit-rate Counters ===
+stats = {"hits": 0, "misses": 0, "shadow_agree": 0, "shadow_disagree": 0}
+_stats_lock = threading.Lock()
+_log_lock = threading.Lock()
+
+
+def _count(key):
+    with _stats_lock:
+        stats[key] += 1
+
+
+def normalize(prompt):
+    # Trailing punctuation would otherwise end up in open/close/play targets
+    return re.sub(r"\s+", " ", prompt.strip().lower()).rstrip(" .!?")
+
+
+def classify_clause(clause):
+    if GREETINGS.match(clause):
+        return f"general {clause}"
+    for pattern, build in RULES:
+        match = pattern.match(clause)
+        if match:
+            decision = build(match)
+            return decision.strip() if decision else None
+    return None
+
+
+def classify(prompt):
+    """Return a DMM-style task list for confidently classifiable prompts, else None."""
+    text = normalize(prompt)
+    if not text:
+        return None
+
+    clauses = [c for c in (c.rstrip(" .!?") for c in CLAUSE_SPLIT.split(text)) if c]
+    if len(clauses) == 1:
+        decision = classify_clause(clauses[0])
+        return [decision] if decision else None
+
+    # Multi-intent prompts are only handled locally when every clause is an
+    # unambiguous command; anything conversational goes to Cohere.
+    decisions = [classify_clause(c) for c in clauses]
+    if not all(decisions) or any(d.startswith("general") for d in decisions):
+        return None
+    return decisions
+
+
+def fast_decision(prompt):
+    """Classify and record a hit or miss; used by FirstLayerDMM in "on" mode."""
+    decision = classify(prompt)
+    _count("hits" if decision else "misses")
+    return decision
+
+
+def record_shadow(prompt, local, remote):
+    """Log a local-vs-remote comparison line (shadow mode)."""
+    if local is None:
+        _count("misses")
+        return
+    _count("hits")
+    _count("shadow_agree" if local == remote else "shadow_disagree")
+    entry = {"ts": datetime.now().isoformat(), "prompt": prompt, "local": local, "remote": remote}
+    try:
+        with _log_lock, open(FASTPATH_LOG, "a", encoding="utf-8") as log:
+            log.write(json.dumps(entry) + "\n")
+    except OSError as e:
+        print(f"⚠️ Failed to write DMM shadow log: {e}")
+
+
+def hit_rate():
+    with _stats_lock:
+        total = stats["hits"] + stats["misses"]
+        return stats["hits"] / total if total else 0.0
@@ -0,0 +1,76 @@
+# ============================================
+# File: llm_clients.py
+# Description: Process-wide Groq/Cohere clients sharing tuned keep-alive HTTP transports
+# ============================================
+
+import os
+import threading
+
+import httpx
+
+# === Load .env Variables (new names first, legacy names as fallback) ===
+GROQ_API_KEY = os.environ.get("GROQ_API_KEY") or os.environ.get("GroqAPIKey")
+COHERE_API_KEY = os.environ.get("COHERE_API_KEY") or os.environ.get("CohereAPIKey")
+
+LLM_MAX_CONNECTIONS = int(os.environ.get("LLM_MAX_CONNECTIONS", "20"))
+LLM_MAX_KEEPALIVE = int(os.environ.get("LLM_MAX_KEEPALIVE", "10"))
+LLM_KEEPALIVE_EXPIRY = float(os.environ.get("LLM_KEEPALIVE_EXPIRY", "60"))
+LLM_CONNECT_TIMEOUT = float(os.environ.get("LLM_CONNECT_TIMEOUT", "5"))
+LLM_READ_TIMEOUT = float(os.environ.get("LLM_READ_TIMEOUT", "60"))
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "2"))
+
+
+def http2_available():
+    try:
+        import h2  # noqa: F401  (httpx needs the h2 package for HTTP/2)
+        return True
+    except ImportError:
+        return False
+
+
+def build_http_client():
+    return httpx.Client(
+        http2=http2_available(),
+        limits=httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_KEEPALIVE,
+            keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+    )
+
+
+# === Registry (one client per provider per process) ===
+_clients = {}
+_clients_pid = None
+_lock = threading.Lock()
+
+
+def _get(name, factory):
+    global _clients_pid
+    pid = os.getpid()
+    client = _clients.get(name) if _clients_pid == pid else None
+    if client is None:
+        with _lock:
+            if _clients_pid != pid:
+                _clients.clear()
+                _clients_pid = pid
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = factory()
+    return client
+
+
+# SDKs are imported on first use so stub-only runs do not need them installed
+def groq_client():
+    def build():
+        from groq import Groq
+        return Groq(api_key=GROQ_API_KEY, http_client=build_http_client(), max_retries=LLM_MAX_RETRIES)
+    return _get("groq", build)
+
+
+def cohere_client():
+    def build():
+        import cohere
+        return cohere.Client(api_key=COHERE_API_KEY, httpx_client=build_http_client(), timeout=LLM_READ_TIMEOUT)
+    return _get("cohere", build)
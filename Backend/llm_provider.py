@@ -0,0 +1,170 @@
+# ============================================
+# File: llm_provider.py
+# Description: Provider layer for every LLM call (Groq, Cohere, or a local stub for load tests)
+# ============================================
+
+import os
+import time
+import random
+import hashlib
+
+from Backend.llm_clients import groq_client, cohere_client
+
+# === Load .env Variables ===
+# LLM_PROVIDER=stub routes Chat, RealtimeSearchEngine, WriteContent and FirstLayerDMM
+# to the local stub; anything else uses the real upstream APIs.
+LLM_PROVIDER = os.environ.get("LLM_PROVIDER", "remote").lower()
+GROQ_MODEL = os.environ.get("GROQ_MODEL", "llama3-70b-8192")
+COHERE_MODEL = os.environ.get("COHERE_MODEL", "command-r-plus")
+
+STUB_LATENCY_MS = float(os.environ.get("LLM_STUB_LATENCY_MS", "300"))
+STUB_JITTER = float(os.environ.get("LLM_STUB_JITTER", "0.3"))
+STUB_TOKENS_PER_SEC = float(os.environ.get("LLM_STUB_TOKENS_PER_SEC", "250"))
+STUB_TOKENS = int(os.environ.get("LLM_STUB_TOKENS", "60"))
+STUB_SEED = os.environ.get("LLM_STUB_SEED", "jarvis")
+
+
+def last_user_message(messages):
+    for message in reversed(messages):
+        if message["role"] == "user":
+            return message["content"]
+    return ""
+
+
+# ============================================
+# Providers
+# ============================================
+# Every provider exposes:
+#   complete(messages, purpose, max_tokens, temperature) -> str
+#   stream(messages, purpose, max_tokens, temperature)   -> iterator of text deltas
+# `messages` are OpenAI-style {"role", "content"} dicts; `purpose` is one of
+# "chat", "realtime", "content", "dmm", "summary" and is only used by the stub.
+
+class GroqProvider:
+    def __init__(self, model=GROQ_MODEL):
+        self.model = model
+
+    def complete(self, messages, purpose="chat", max_tokens=1024, temperature=0.7):
+        completion = groq_client().chat.completions.create(
+            model=self.model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            top_p=1,
+            stream=False
+        )
+        return completion.choices[0].message.content
+
+    def stream(self, messages, purpose="chat", max_tokens=1024, temperature=0.7):
+        completion = groq_client().chat.completions.create(
+            model=self.model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            top_p=1,
+            stream=True
+        )
+        for chunk in completion:
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+
+
+class CohereProvider:
+    """Maps OpenAI-style messages onto Cohere chat: system -> preamble, earlier turns -> chat_history."""
+
+    def __init__(self, model=COHERE_MODEL):
+        self.model = model
+
+    def stream(self, messages, purpose="dmm", max_tokens=None, temperature=0.7):
+        preamble = "\n".join(m["content"] for m in messages if m["role"] == "system")
+        turns = [m for m in messages if m["role"] != "system"]
+        history = [
+            {"role": "User" if m["role"] == "user" else "Chatbot", "message": m["content"]}
+            for m in turns[:-1]
+        ]
+        stream = cohere_client().chat_stream(
+            model=self.model,
+            message=turns[-1]["content"],
+            temperature=temperature,
+            chat_history=history,
+            prompt_truncation='OFF',
+            connectors=[],
+            preamble=preamble
+        )
+        for event in stream:
+            if event.event_type == "text-generation":
+                yield event.text
+
+    def complete(self, messages, purpose="dmm", max_tokens=None, temperature=0.7):
+        return "".join(self.stream(messages, purpose, max_tokens, temperature))
+
+
+class StubProvider:
+    """
+    Deterministic local stand-in. Output depends only on (seed, purpose, query);
+    first-token latency is log-normal around LLM_STUB_LATENCY_MS and tokens are
+    paced at LLM_STUB_TOKENS_PER_SEC, so app overhead can be measured without
+    upstream cost or quota.
+    """
+
+    def __init__(self, latency_ms=STUB_LATENCY_MS, jitter=STUB_JITTER,
+                 tokens_per_sec=STUB_TOKENS_PER_SEC, tokens=STUB_TOKENS, seed=STUB_SEED):
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+        self.tokens_per_sec = tokens_per_sec
+        self.tokens = tokens
+        self.seed = seed
+
+    def _rng(self, purpose, query):
+        digest = hashlib.sha256(f"{self.seed}|{purpose}|{query}".encode()).digest()
+        return random.Random(int.from_bytes(digest[:8], "big"))
+
+    def _text(self, purpose, query, rng):
+        if purpose == "dmm":
+            return f"general {query}"
+        words = ["alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel"]
+        body = " ".join(rng.choice(words) for _ in range(self.tokens))
+        return f"Stub {purpose} answer to: {query}\n{body}."
+
+    def _first_token_delay(self, rng):
+        scale = rng.lognormvariate(0, self.jitter) if self.jitter else 1.0
+        return max(0.0, self.latency_ms) * scale / 1000
+
+    def stream(self, messages, purpose="chat", max_tokens=1024, temperature=0.7):
+        query = last_user_message(messages)
+        rng = self._rng(purpose, query)
+        text = self._text(purpose, query, rng)
+        time.sleep(self._first_token_delay(rng))
+        pace = 1 / self.tokens_per_sec if self.tokens_per_sec > 0 else 0
+        for index, token in enumerate(text.split(" ")):
+            if index and pace:
+                time.sleep(pace)
+            yield token if index == 0 else f" {token}"
+
+    def complete(self, messages, purpose="chat", max_tokens=1024, temperature=0.7):
+        return "".join(self.stream(messages, purpose, max_tokens, temperature))
+
+
+# ============================================
+# Selection
+# ============================================
+
+_stub = None
+
+def use_stub():
+    return LLM_PROVIDER == "stub"
+
+def stub_provider():
+    global _stub
+    if _stub is None:
+        _stub = StubProvider()
+    return _stub
+
+def chat_llm():
+    """Provider for Chat, RealtimeSearchEngine and WriteContent."""
+    return stub_provider() if use_stub() else GroqProvider()
+
+def decision_llm():
+    """Provider for FirstLayerDMM."""
+    return stub_provider() if use_stub() else CohereProvider()
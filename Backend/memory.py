@@ -0,0 +1,212 @@
+# ============================================
+# File: memory.py
+# Description: Per-user conversation memory for Chat (rolling window + summaries)
+#
+# Each user keeps the last MEMORY_WINDOW turns in process memory. A cold user
+# (new worker, restart or idle eviction) is loaded from the newest rows of
+# `chats`, and so is a warm one whose newest stored chat is newer than anything
+# this process has seen (a turn served by another gunicorn worker). Turns
+# pushed out of the window queue up, and every MEMORY_SUMMARY_BATCH of them
+# are folded into a running summary by a background LLM call. context_messages() returns the summary plus as many
+# recent turns as fit in MEMORY_TOKEN_BUDGET.
+# ============================================
+
+import os
+import re
+import time
+import threading
+from datetime import datetime
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from Backend.llm_provider import chat_llm
+from jarvis_db import get_chat_page, get_latest_chat_time
+
+# === Load .env Variables ===
+MEMORY_ENABLED = os.environ.get("CHAT_MEMORY", "1") == "1"
+MEMORY_WINDOW = int(os.environ.get("MEMORY_WINDOW", "12"))
+MEMORY_TOKEN_BUDGET = int(os.environ.get("MEMORY_TOKEN_BUDGET", "1200"))
+MEMORY_SUMMARY_BATCH = int(os.environ.get("MEMORY_SUMMARY_BATCH", "6"))
+MEMORY_SUMMARY_TOKENS = int(os.environ.get("MEMORY_SUMMARY_TOKENS", "200"))
+MEMORY_USERS = int(os.environ.get("MEMORY_USERS", "5000"))
+MEMORY_IDLE_TTL = float(os.environ.get("MEMORY_IDLE_TTL", "900"))
+MEMORY_TURN_CHARS = int(os.environ.get("MEMORY_TURN_CHARS", "2000"))
+
+
+# ============================================
+# Tokenizer
+# ============================================
+# Regex estimate of BPE token counts: one token per word or punctuation mark,
+# plus one per further 6 characters of a long word. Within ~10% of the
+# llama/cl100k tokenizers on English chat text and needs no model files.
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+def count_tokens(text):
+    return sum(1 + (len(piece) - 1) // 6 for piece in TOKEN_PATTERN.findall(text or ""))
+
+
+# ============================================
+# Memory Store
+# ============================================
+
+class UserMemory:
+    def __init__(self, turns, newest=None):
+        self.turns = deque(turns)   # (query, answer), oldest first
+        self.newest = newest        # newest turn time known to this process
+        self.overflow = []
+        self.summary = ""
+        self.summarizing = False
+        self.touched = time.monotonic()
+
+
+class ConversationMemory:
+    def __init__(self, loader, latest, window=MEMORY_WINDOW, budget=MEMORY_TOKEN_BUDGET,
+                 summary_batch=MEMORY_SUMMARY_BATCH, max_users=MEMORY_USERS, idle_ttl=MEMORY_IDLE_TTL):
+        self.loader = loader
+        self.latest = latest
+        self.window = window
+        self.budget = budget
+        self.summary_batch = summary_batch
+        self.max_users = max_users
+        self.idle_ttl = idle_ttl
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+        self._summarizer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="jarvis-memory")
+        self.stats = {"loads": 0, "refreshes": 0, "summaries": 0, "summary_failures": 0, "prompt_tokens": 0, "prompts": 0}
+
+    def _get(self, user_id, refresh=False):
+        now = time.monotonic()
+        with self._lock:
+            memory = self._users.get(user_id)
+            if memory is not None and now - memory.touched <= self.idle_ttl:
+                memory.touched = now
+                self._users.move_to_end(user_id)
+            else:
+                memory = None
+
+        if memory is not None:
+            if refresh and self._stale(user_id, memory):
+                self._reload(user_id, memory)
+            return memory
+
+        memory = UserMemory([])
+        self._reload(user_id, memory, count=False)
+        with self._lock:
+            self.stats["loads"] += 1
+            self._users[user_id] = memory
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        return memory
+
+    def _stale(self, user_id, memory):
+        try:
+            latest = self.latest(user_id)
+        except Exception as e:
+            print(f"⚠️ Memory freshness check failed: {e}")
+            return False
+        return latest is not None and (memory.newest is None or latest > memory.newest)
+
+    def _reload(self, user_id, memory, count=True):
+        """Replace the window with the newest stored turns; the summary is kept."""
+        try:
+            rows = self.loader(user_id, self.window)
+        except Exception as e:
+            print(f"⚠️ Memory load failed: {e}")
+            rows = []
+        with self._lock:
+            memory.turns = deque((clip(r["message"]), clip(r["response"])) for r in rows)
+            if rows:
+                memory.newest = max(memory.newest or rows[-1]["timestamp"], rows[-1]["timestamp"])
+            if count:
+                self.stats["refreshes"] += 1
+
+    def context_messages(self, user_id):
+        """OpenAI-style messages (summary first, then turns oldest->newest) within the token budget."""
+        memory = self._get(user_id, refresh=True)
+        with self._lock:
+            summary = memory.summary
+            turns = list(memory.turns)
+
+        messages = []
+        used = 0
+        if summary:
+            used = count_tokens(summary)
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation: {summary}"})
+
+        recent = []
+        for query, answer in reversed(turns):
+            cost = count_tokens(query) + count_tokens(answer)
+            if used + cost > self.budget:
+                break
+            used += cost
+            recent.append((query, answer))
+        for query, answer in reversed(recent):
+            messages.append({"role": "user", "content": query})
+            messages.append({"role": "assistant", "content": answer})
+
+        with self._lock:
+            self.stats["prompt_tokens"] += used
+            self.stats["prompts"] += 1
+        return messages
+
+    def remember(self, user_id, query, answer):
+        memory = self._get(user_id)
+        with self._lock:
+            memory.turns.append((clip(query), clip(answer)))
+            # Taken after enqueue_chat stamped the row, so our own row never looks newer
+            memory.newest = datetime.now()
+            while len(memory.turns) > self.window:
+                memory.overflow.append(memory.turns.popleft())
+            if len(memory.overflow) < self.summary_batch or memory.summarizing:
+                return
+            memory.summarizing = True
+            batch, memory.overflow = memory.overflow, []
+            previous = memory.summary
+        self._summarizer.submit(self._summarize, memory, previous, batch)
+
+    def _summarize(self, memory, previous, batch):
+        transcript = "\n".join(f"User: {q}\nAssistant: {a}" for q, a in batch)
+        messages = [
+            {"role": "system", "content": (
+                "Compress the conversation into a short factual summary for an assistant's memory. "
+                "Keep names, preferences, decisions and open questions. Reply with the summary only."
+            )},
+            {"role": "user", "content": f"Existing summary: {previous or '(none)'}\n\nNew turns:\n{transcript}"},
+        ]
+        try:
+            summary = chat_llm().complete(messages, purpose="summary", max_tokens=MEMORY_SUMMARY_TOKENS, temperature=0.2)
+            with self._lock:
+                memory.summary = summary.strip()
+                self.stats["summaries"] += 1
+        except Exception as e:
+            # Keep the previous summary; the batch is dropped rather than retried
+            print(f"⚠️ Memory summary failed: {e}")
+            with self._lock:
+                self.stats["summary_failures"] += 1
+        finally:
+            with self._lock:
+                memory.summarizing = False
+
+    def forget(self, user_id):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def snapshot(self):
+        with self._lock:
+            data = dict(self.stats, users=len(self._users))
+        data["avg_prompt_tokens"] = data["prompt_tokens"] / data["prompts"] if data["prompts"] else 0.0
+        return data
+
+
+def clip(text):
+    text = text or ""
+    return text if len(text) <= MEMORY_TURN_CHARS else text[:MEMORY_TURN_CHARS] + " …"
+
+
+def _load_recent(user_id, limit):
+    messages, _ = get_chat_page(user_id, limit=limit)
+    return messages
+
+
+conversation_memory = ConversationMemory(_load_recent, get_latest_chat_time)
@@ -0,0 +1,231 @@
+# ============================================
+# File: metrics.py
+# Description: Stage timers, histograms and a Prometheus text exposition for /metrics
+# ============================================
+
+import os
+import json
+import time
+import threading
+import functools
+from contextlib import contextmanager
+
+# === Load .env Variables ===
+# METRICS_ENABLED=0 makes @timed return the original function (zero overhead)
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+METRICS_LOG_REQUESTS = os.environ.get("METRICS_LOG_REQUESTS", "0") == "1"
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Histogram:
+    def __init__(self, name, help_text, label_names, buckets=BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series["counts"][i] += 1
+                    break
+            series["sum"] += seconds
+            series["count"] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(labels, dict(s, counts=list(s["counts"]))) for labels, s in self._series.items()]
+        for labels, series in sorted(items):
+            base = ",".join(f'{k}="{v}"' for k, v in zip(self.label_names, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets, series["counts"]):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{base},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{base},le="+Inf"}} {series["count"]}')
+            lines.append(f"{self.name}_sum{{{base}}} {series['sum']:.6f}")
+            lines.append(f"{self.name}_count{{{base}}} {series['count']}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            base = ",".join(f'{k}="{v}"' for k, v in zip(self.label_names, labels))
+            lines.append(f"{self.name}{{{base}}} {value}")
+        return lines
+
+
+# === Registry ===
+stage_seconds = Histogram("jarvis_stage_seconds", "Time spent in a backend stage.", ("stage",))
+stage_errors = Counter("jarvis_stage_errors_total", "Exceptions raised out of a backend stage.", ("stage",))
+http_seconds = Histogram("jarvis_http_request_seconds", "Flask request latency.", ("route", "method", "status"))
+throttled = Counter("jarvis_rate_limited_total", "Requests rejected with 429 by the rate limiter.", ("policy", "scope"))
+
+# Callables returning {name: number}; rendered as gauges (pool, queue and cache stats)
+_gauge_sources = {}
+
+
+def register_gauges(prefix, source):
+    _gauge_sources[prefix] = source
+
+
+# ============================================
+# Per-request Span Collection
+# ============================================
+
+def _request_spans():
+    # Spans live in the WSGI environ, which is shared by copies of the request
+    # context (e.g. tasks run on the task executor's threads).
+    try:
+        from flask import has_request_context, request
+        if has_request_context():
+            return request.environ.setdefault("jarvis.spans", [])
+    except ImportError:
+        pass
+    return None
+
+
+def record(stage, seconds, error=False):
+    stage_seconds.observe(seconds, stage)
+    if error:
+        stage_errors.inc(stage)
+    if METRICS_LOG_REQUESTS:
+        spans = _request_spans()
+        if spans is not None:
+            spans.append({"stage": stage, "ms": round(seconds * 1000, 2), "error": error})
+
+
+@contextmanager
+def span(stage):
+    if not METRICS_ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    error = False
+    try:
+        yield
+    except Exception:
+        error = True
+        raise
+    finally:
+        record(stage, time.perf_counter() - start, error)
+
+
+def timed(stage):
+    """Decorator recording each call's duration under `stage`."""
+    def decorate(fn):
+        if not METRICS_ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            error = False
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                error = True
+                raise
+            finally:
+                record(stage, time.perf_counter() - start, error)
+        return wrapper
+    return decorate
+
+
+def timed_stream(stage):
+    """
+    Decorator for generator functions: times from the first next() until the
+    generator finishes, raises or is closed (client disconnect), and passes
+    its return value through `yield from`.
+    """
+    def decorate(fn):
+        if not METRICS_ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return (yield from fn(*args, **kwargs))
+        return wrapper
+    return decorate
+
+
+# ============================================
+# Flask Integration
+# ============================================
+
+def init_app(app):
+    if not METRICS_ENABLED:
+        return
+
+    from flask import request, g
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_start = time.perf_counter()
+
+    def _finish(start, route, method, status, environ):
+        elapsed = time.perf_counter() - start
+        http_seconds.observe(elapsed, route, method, status)
+        if METRICS_LOG_REQUESTS:
+            print(json.dumps({
+                "route": route,
+                "method": method,
+                "status": status,
+                "ms": round(elapsed * 1000, 2),
+                "spans": environ.get("jarvis.spans", []),
+            }))
+
+    @app.after_request
+    def _observe(response):
+        start = getattr(g, "metrics_start", None)
+        if start is None or request.endpoint == "metrics_route":
+            return response
+        args = (start, request.url_rule.rule if request.url_rule else "unmatched",
+                request.method, response.status_code, request.environ)
+        if response.is_streamed:
+            # SSE/chunked bodies are produced after this hook; time the whole
+            # response once the server has sent it (or the client went away)
+            response.call_on_close(lambda: _finish(*args))
+        else:
+            _finish(*args)
+        return response
+
+
+def render():
+    lines = []
+    for metric in (http_seconds, stage_seconds, stage_errors, throttled):
+        lines.extend(metric.render())
+    for prefix, source in sorted(_gauge_sources.items()):
+        try:
+            values = source() or {}
+        except Exception as e:
+            print(f"⚠️ Metrics source '{prefix}' failed: {e}")
+            continue
+        for key, value in sorted(values.items()):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                lines.append(f"# TYPE jarvis_{prefix}_{key} gauge")
+                lines.append(f"jarvis_{prefix}_{key} {value}")
+    return "\n".join(lines) + "\n"
@@ -1,18 +1,19 @@
 # === Imports ===
 import os
-import cohere
+import re
+import time
+import threading
 from dotenv import dotenv_values
+from Backend.cache import TTLCache, shared_backend
+from Backend.llm_clients import COHERE_API_KEY
+from Backend.llm_provider import decision_llm, use_stub
+from Backend.metrics import timed
+from Backend.fast_classifier import FASTPATH_MODE, classify, fast_decision, record_shadow
 
-# === Load API Key from .env ===
-CohereAPIKey = os.environ.get("CohereAPIKey")
-
-# === Raise error if not set ===
-if not CohereAPIKey:
+# === Raise error if API key not set (COHERE_API_KEY or legacy CohereAPIKey) ===
+if not COHERE_API_KEY and not use_stub():
     raise ValueError("❌ CohereAPIKey not found in .env file")
 
-# === Initialize Cohere Client ===
-co = cohere.Client(api_key=CohereAPIKey)
-
 # === Defined Function Tags ===
 funcs = [
     "exit", "general", "realtime", "open", "close", "play",
@@ -37,35 +38,81 @@ ChatHistory = [
 ]
 
 # === Decision-Making Function ===
+@timed("dmm")
 def FirstLayerDMM(prompt: str):
-    try:
-        stream = co.chat_stream(
-            model='command-r-plus',
-            message=prompt,
-            temperature=0.7,
-            chat_history=ChatHistory,
-            prompt_truncation='OFF',
-            connectors=[],
-            preamble=preamble
-        )
-
-        raw_response = ""
-        for event in stream:
-            if event.event_type == "text-generation":
-                raw_response += event.text
-
-        # Extract relevant function tags
-        response = raw_response.replace("\n", "").split(",")
-        response = [r.strip() for r in response if any(r.strip().startswith(f) for f in funcs)]
+    # Fast path: resolve trivially classifiable prompts locally
+    if FASTPATH_MODE == "on":
+        local = fast_decision(prompt)
+        if local:
+            return local
+    elif FASTPATH_MODE == "shadow":
+        local = classify(prompt)
+        remote = RemoteDMM(prompt)
+        record_shadow(prompt, local, remote)
+        return remote
 
-        # Retry if invalid structure
-        if any("(query)" in r for r in response):
-            return FirstLayerDMM(prompt)
+    return RemoteDMM(prompt)
+
+# === Retry / Cache Settings ===
+DMM_MAX_ATTEMPTS = int(os.environ.get("DMM_MAX_ATTEMPTS", "3"))
+DMM_BACKOFF = float(os.environ.get("DMM_BACKOFF", "0.5"))
+DMM_CACHE_TTL = int(os.environ.get("DMM_CACHE_TTL", "3600"))
+DMM_CACHE_SIZE = int(os.environ.get("DMM_CACHE_SIZE", "2048"))
+
+dmm_cache = TTLCache(maxsize=DMM_CACHE_SIZE, ttl=DMM_CACHE_TTL, name="dmm", shared=shared_backend())
+dmm_stats = {"retries": 0, "give_ups": 0}
+_dmm_stats_lock = threading.Lock()
+
+def _count(key):
+    with _dmm_stats_lock:
+        dmm_stats[key] += 1
+
+def normalize_prompt(prompt):
+    return re.sub(r"\s+", " ", prompt.strip().lower()).rstrip(" .!?")
 
-        return response
+# === Single Decision-Model Call (Cohere or local stub) ===
+def build_dmm_messages(prompt):
+    messages = [{"role": "system", "content": preamble}]
+    for turn in ChatHistory:
+        messages.append({"role": "user" if turn["role"] == "User" else "assistant", "content": turn["message"]})
+    messages.append({"role": "user", "content": prompt})
+    return messages
+
+def query_cohere(prompt: str):
+    raw_response = decision_llm().complete(build_dmm_messages(prompt), purpose="dmm", temperature=0.7)
+
+    # Extract relevant function tags
+    response = raw_response.replace("\n", "").split(",")
+    return [r.strip() for r in response if any(r.strip().startswith(f) for f in funcs)]
+
+# === Cohere Decision-Making Model (cached, bounded retries) ===
+@timed("dmm.remote")
+def RemoteDMM(prompt: str):
+    key = normalize_prompt(prompt)
+    cached = dmm_cache.get(key)
+    if cached is not None:
+        return list(cached)
+
+    last_error = None
+    for attempt in range(DMM_MAX_ATTEMPTS):
+        if attempt:
+            _count("retries")
+            time.sleep(DMM_BACKOFF * (2 ** (attempt - 1)))
+        try:
+            response = query_cohere(prompt)
+        except Exception as e:
+            last_error = e
+            continue
+
+        # Retry if invalid structure
+        if response and not any("(query)" in r for r in response):
+            dmm_cache.set(key, response)
+            return response
 
-    except Exception as e:
-        return [f"❌ Error in DMM: {e}"]
+    _count("give_ups")
+    if last_error is not None:
+        return [f"❌ Error in DMM: {last_error}"]
+    return [f"general {prompt}"]
 
 # === CLI Test Mode ===
 if __name__ == "__main__":
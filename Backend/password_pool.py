@@ -0,0 +1,108 @@
+# ============================================
+# File: password_pool.py
+# Description: bcrypt hashing/verification on a bounded process pool with a configurable cost
+# ============================================
+
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeout
+
+import bcrypt
+
+# === Load .env Variables ===
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "12"))
+BCRYPT_WORKERS = int(os.environ.get("BCRYPT_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+BCRYPT_MAX_PENDING = int(os.environ.get("BCRYPT_MAX_PENDING", str(BCRYPT_WORKERS * 4)))
+BCRYPT_TIMEOUT = float(os.environ.get("BCRYPT_TIMEOUT", "10"))
+
+
+class HasherBusy(Exception):
+    """Raised when the password pool queue is full; callers should answer 503."""
+
+
+# === Worker Functions (run in the pool processes) ===
+def _hash(password, rounds):
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds)).decode()
+
+def _check(password, hashed):
+    return bcrypt.checkpw(password.encode(), hashed.encode())
+
+
+# === Pool (created lazily, re-created after gunicorn fork) ===
+_executor = None
+_executor_pid = None
+_lock = threading.Lock()
+_pending = 0
+stats = {"submitted": 0, "rejected": 0, "timeouts": 0}
+
+# Workers are started from a clean forkserver (spawn where unavailable), never
+# forked from a gunicorn worker that already runs request, pool and TTS threads.
+def _mp_context():
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method)
+
+def _get_executor():
+    global _executor, _executor_pid
+    pid = os.getpid()
+    if _executor is None or _executor_pid != pid:
+        with _lock:
+            if _executor is None or _executor_pid != pid:
+                _executor = ProcessPoolExecutor(max_workers=BCRYPT_WORKERS, mp_context=_mp_context())
+                _executor_pid = pid
+    return _executor
+
+def _release(_future=None):
+    global _pending
+    with _lock:
+        _pending -= 1
+
+def _run(fn, *args):
+    global _pending
+    if BCRYPT_WORKERS <= 0:
+        return fn(*args)
+
+    with _lock:
+        if _pending >= BCRYPT_MAX_PENDING:
+            stats["rejected"] += 1
+            raise HasherBusy("Password hashing queue is full.")
+        _pending += 1
+        stats["submitted"] += 1
+    try:
+        future = _get_executor().submit(fn, *args)
+    except Exception:
+        _release()
+        raise
+    # A hash keeps its slot until it really finishes, even if the caller gave up on it
+    future.add_done_callback(_release)
+    try:
+        return future.result(timeout=BCRYPT_TIMEOUT)
+    except FuturesTimeout:
+        future.cancel()
+        with _lock:
+            stats["timeouts"] += 1
+        raise HasherBusy("Password hashing timed out.")
+
+
+# ============================================
+# Public API
+# ============================================
+
+def hash_password(password, rounds=None):
+    return _run(_hash, password, rounds or BCRYPT_ROUNDS)
+
+def verify_password(password, hashed):
+    return _run(_check, password, hashed)
+
+def hash_cost(hashed):
+    """Cost factor stored in a bcrypt hash ("$2b$12$..." -> 12)."""
+    try:
+        return int(hashed.split("$")[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+def needs_rehash(hashed):
+    return hash_cost(hashed) != BCRYPT_ROUNDS
+
+def queue_depth():
+    return _pending
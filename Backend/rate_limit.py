@@ -0,0 +1,235 @@
+# ============================================
+# File: rate_limit.py
+# Description: Token-bucket admission control for expensive routes (per user, per IP, per account)
+#
+# Every (policy, scope, key) has a bucket of `burst` tokens refilled at
+# `rate` tokens per second; a request spends one token from each of its
+# policy's buckets. Buckets live in process memory (LocalBuckets), or in Redis
+# when RATE_LIMIT_REDIS_URL / REDIS_URL is set so all workers share them.
+# Both backends expose the same take() and either can stand in for the other.
+#
+# Policies are "count/seconds:burst", overridable per scope with e.g.
+#   RATE_LIMIT_ASK_USER="30/60:10"   RATE_LIMIT_LOGIN_IP="20/60:10"
+# ============================================
+
+import os
+import math
+import time
+import threading
+import functools
+from collections import OrderedDict
+
+from Backend import metrics
+
+# === Load .env Variables ===
+RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "1") == "1"
+RATE_LIMIT_REDIS_URL = os.environ.get("RATE_LIMIT_REDIS_URL", os.environ.get("REDIS_URL"))
+RATE_LIMIT_MAX_KEYS = int(os.environ.get("RATE_LIMIT_MAX_KEYS", "100000"))
+# Number of reverse proxies in front of the app (Render: 1) whose X-Forwarded-For entries are trusted
+RATE_LIMIT_TRUSTED_PROXIES = int(os.environ.get("RATE_LIMIT_TRUSTED_PROXIES", "0"))
+
+DEFAULT_POLICIES = {
+    "ask": {"user": "30/60:10", "ip": "120/60:30"},
+    "speak": {"user": "60/60:20", "ip": "240/60:60"},
+    "login": {"ip": "20/60:10", "account": "5/300:5"},
+    "forgot_password": {"ip": "5/3600:3", "account": "3/3600:2"},
+}
+
+
+def parse_limit(spec):
+    """"30/60:10" -> (rate tokens/sec, burst). Burst defaults to the count."""
+    window, _, burst = spec.partition(":")
+    count, _, seconds = window.partition("/")
+    count, seconds = float(count), float(seconds or 1)
+    return count / seconds, float(burst or count)
+
+def load_policies():
+    policies = {}
+    for name, scopes in DEFAULT_POLICIES.items():
+        policies[name] = {
+            scope: parse_limit(os.environ.get(f"RATE_LIMIT_{name.upper()}_{scope.upper()}", spec))
+            for scope, spec in scopes.items()
+        }
+    return policies
+
+POLICIES = load_policies()
+
+
+# ============================================
+# Backends
+# ============================================
+
+class LocalBuckets:
+    """In-process buckets; O(1) per check, least recently used keys dropped past max_keys."""
+
+    def __init__(self, max_keys=RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()   # key -> [tokens, last refill]
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst, cost=1.0):
+        """Spend `cost` tokens; return (allowed, seconds until enough tokens)."""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [burst, now]
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                return True, 0.0
+            return False, (cost - bucket[0]) / rate
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+# Atomic refill-and-take; the bucket expires once it would be full again anyway
+TOKEN_BUCKET_LUA = """
+local rate, burst, now, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 't', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed, wait = 0, 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 't', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {allowed, tostring(wait)}
+"""
+
+class RedisBuckets:
+    """Buckets shared by every worker; on Redis errors falls back to the local stand-in."""
+
+    def __init__(self, client, fallback=None):
+        self.client = client
+        self.fallback = fallback or LocalBuckets()
+        self._script = client.register_script(TOKEN_BUCKET_LUA)
+        self.errors = 0
+
+    def take(self, key, rate, burst, cost=1.0):
+        try:
+            allowed, wait = self._script(keys=[f"ratelimit:{key}"], args=[rate, burst, time.time(), cost])
+            return bool(int(allowed)), float(wait)
+        except Exception as e:
+            self.errors += 1
+            print(f"⚠️ Shared rate limit check failed: {e}")
+            return self.fallback.take(key, rate, burst, cost)
+
+    def __len__(self):
+        return len(self.fallback)
+
+
+def make_backend():
+    if RATE_LIMIT_REDIS_URL:
+        try:
+            import redis
+            return RedisBuckets(redis.Redis.from_url(RATE_LIMIT_REDIS_URL))
+        except ImportError:
+            print("⚠️ A Redis URL is set but the redis package is not installed; using in-process rate limits.")
+    return LocalBuckets()
+
+
+# ============================================
+# Limiter
+# ============================================
+
+class RateLimiter:
+    def __init__(self, backend=None, policies=None):
+        self.backend = backend or make_backend()
+        self.policies = policies or POLICIES
+        self._lock = threading.Lock()
+        self.stats = {"allowed": 0, "throttled": 0}
+
+    def check(self, policy, keys):
+        """
+        `keys` maps scope -> key (None skips that scope). Returns 0.0 when
+        allowed, else the Retry-After in seconds of the first exhausted bucket.
+        """
+        for scope, (rate, burst) in self.policies[policy].items():
+            key = keys.get(scope)
+            if key is None:
+                continue
+            allowed, wait = self.backend.take(f"{policy}:{scope}:{key}", rate, burst)
+            if not allowed:
+                metrics.throttled.inc(policy, scope)
+                with self._lock:
+                    self.stats["throttled"] += 1
+                return max(wait, 0.001)
+        with self._lock:
+            self.stats["allowed"] += 1
+        return 0.0
+
+    def snapshot(self):
+        with self._lock:
+            data = dict(self.stats)
+        data["keys"] = len(self.backend)
+        data["shared_errors"] = getattr(self.backend, "errors", 0)
+        return data
+
+
+limiter = RateLimiter()
+
+
+# ============================================
+# Flask Integration
+# ============================================
+
+def client_ip(request):
+    route = request.access_route
+    if RATE_LIMIT_TRUSTED_PROXIES and len(route) >= RATE_LIMIT_TRUSTED_PROXIES:
+        return route[-RATE_LIMIT_TRUSTED_PROXIES]
+    return request.remote_addr
+
+def too_many_requests(retry_after, policy=None):
+    from flask import jsonify
+    message = "⏳ Too many requests. Please slow down and try again shortly."
+    body = {"status": "error", "message": message}
+    if policy == "ask":
+        body["response"] = message   # the chat UI renders data.response
+    response = jsonify(body)
+    response.status_code = 429
+    response.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+    return response
+
+def rate_limited(policy, account_field=None, account_per_ip=False):
+    """
+    Route decorator applying `policy`. The "user" scope keys on the session
+    user, "ip" on the client address and "account" on the JSON body field
+    `account_field` (the login identifier or username under attack). With
+    `account_per_ip` the account bucket is per (account, ip), so guessing from
+    one address is slowed without letting anyone lock the real user out.
+    """
+    def decorate(view):
+        if not RATE_LIMIT_ENABLED:
+            return view
+
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            from flask import request, session
+            ip = client_ip(request)
+            account = None
+            if account_field:
+                account = str((request.get_json(silent=True) or {}).get(account_field, "")).strip().lower() or None
+                if account and account_per_ip:
+                    account = f"{account}|{ip}"
+            retry_after = limiter.check(policy, {
+                "user": session.get("user_id") or session.get("username"),
+                "ip": ip,
+                "account": account,
+            })
+            if retry_after:
+                return too_many_requests(retry_after, policy)
+            return view(*args, **kwargs)
+        return wrapper
+    return decorate
@@ -1,40 +1,82 @@
 # === Imports ===
 from googlesearch import search
-from groq import Groq
-from flask import session
+from Backend.llm_provider import chat_llm
 from dotenv import dotenv_values
 import datetime
-import psycopg2
+import time
+import re
 import os
+from Backend.cache import TTLCache, SingleFlight, shared_backend
+from Backend.metrics import timed, timed_stream
 
 # === Load Environment Variables ===
 
-GroqAPIKey = os.environ.get("GroqAPIKey")
 Assistantname = os.environ.get("Assistantname", "Jarvis")
-PG_USER = os.environ.get("PG_USER")
-PG_PASS = os.environ.get("PG_PASS")
-PG_HOST = os.environ.get("PG_HOST")
-PG_DB = os.environ.get("PG_DB")
-
-# === Initialize Groq Client ===
-client = Groq(api_key=GroqAPIKey)
-
-# === PostgreSQL Connection ===
-def get_db():
-    return psycopg2.connect(
-        dbname=PG_DB,
-        user=PG_USER,
-        password=PG_PASS,
-        host=PG_HOST
-    )
+
+# === Cache Settings ===
+SEARCH_CACHE_TTL = int(os.environ.get("SEARCH_CACHE_TTL", "600"))
+ANSWER_CACHE_TTL = int(os.environ.get("ANSWER_CACHE_TTL", "120"))
+ANSWER_BUCKET_SECONDS = int(os.environ.get("ANSWER_BUCKET_SECONDS", "300"))
+
+# === Caches (normalized query -> snippets, (query, time bucket) -> answer) ===
+search_cache = TTLCache(maxsize=2048, ttl=SEARCH_CACHE_TTL, name="search", shared=shared_backend())
+answer_cache = TTLCache(maxsize=1024, ttl=ANSWER_CACHE_TTL, name="answer", shared=shared_backend())
+search_flight = SingleFlight()
+answer_flight = SingleFlight()
+
+def normalize_query(query):
+    return re.sub(r"\s+", " ", query.strip().lower()).rstrip(" .!?")
+
+def answer_key(query):
+    return f"{normalize_query(query)}|{int(time.time() // ANSWER_BUCKET_SECONDS)}"
+
+# === Search Providers ===
+def google_provider(query, num_results=5):
+    return [(res.title, res.description) for res in search(query, advanced=True, num_results=num_results)]
+
+class FakeSearchProvider:
+    """Offline provider for tests and load runs; returns canned (title, description) pairs."""
+
+    def __init__(self, results=None, delay=0.0):
+        self.results = results
+        self.delay = delay
+        self.calls = 0
+
+    def __call__(self, query, num_results=5):
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        if self.results is not None:
+            return list(self.results)[:num_results]
+        return [(f"Result {i + 1} for {query}", f"Stub description {i + 1} about {query}.") for i in range(num_results)]
+
+search_provider = google_provider
+
+def set_search_provider(provider):
+    global search_provider
+    search_provider = provider
+
+@timed("search")
+def fetch_snippets(query):
+    key = normalize_query(query)
+    cached = search_cache.get(key)
+    if cached is not None:
+        return cached
+
+    def fetch():
+        results = [list(r) for r in search_provider(query, num_results=5)]
+        search_cache.set(key, results)
+        return results
+
+    return search_flight.do(key, fetch)
 
 # === Google Search Helper ===
 def GoogleSearch(query):
     try:
-        results = list(search(query, advanced=True, num_results=5))
+        results = fetch_snippets(query)
         answer = f"The search results for '{query}' are:\n[start]\n"
-        for res in results:
-            answer += f"Title: {res.title}\nDescription: {res.description}\n\n"
+        for title, description in results:
+            answer += f"Title: {title}\nDescription: {description}\n\n"
         answer += "[end]"
         return answer
     except Exception as e:
@@ -56,44 +98,66 @@ def Information():
         f"Time: {now.strftime('%H')} hours, {now.strftime('%M')} minutes, {now.strftime('%S')} seconds.\n"
     )
 
-# === Main Function ===
-def RealtimeSearchEngine(prompt):
-    try:
-        username = session.get("username", "User")
-
-        system_prompt = (
-            f"Hello, I am {username}, You are a very accurate and advanced AI chatbot named {Assistantname}, "
-            f"which has real-time up-to-date information from the internet.\n"
-            "*** Provide Answers In a Professional Way, make sure to add full stops, commas, question marks, and use proper grammar. ***\n"
-            "*** Just answer the question from the provided data in a professional way. ***"
-        )
-
-        chat_context = [
-            {"role": "system", "content": system_prompt},
-            {"role": "system", "content": GoogleSearch(prompt)},
-            {"role": "system", "content": Information()},
-            {"role": "user", "content": prompt},
-        ]
-
-        completion = client.chat.completions.create(
-            model="llama3-70b-8192",
-            messages=chat_context,
-            temperature=0.7,
-            max_tokens=2048,
-            top_p=1,
-            stream=True
-        )
+# === Message Context ===
+# The prompt is user-neutral on purpose: answers are cached and single-flighted
+# across users, so nothing user-specific may reach the model.
+def build_search_context(prompt):
+    system_prompt = (
+        f"You are a very accurate and advanced AI chatbot named {Assistantname}, "
+        f"which has real-time up-to-date information from the internet.\n"
+        "*** Provide Answers In a Professional Way, make sure to add full stops, commas, question marks, and use proper grammar. ***\n"
+        "*** Just answer the question from the provided data in a professional way. ***"
+    )
 
-        answer = ""
-        for chunk in completion:
-            delta = chunk.choices[0].delta.content
-            if delta:
-                answer += delta
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "system", "content": GoogleSearch(prompt)},
+        {"role": "system", "content": Information()},
+        {"role": "user", "content": prompt},
+    ]
 
-        cleaned = AnswerModifier(answer)
+# === Streaming Function ===
+# Yields text deltas as Groq produces them and returns the cleaned answer
+# (use `answer = yield from RealtimeSearchEngineStream(prompt)`).
+@timed_stream("realtime_stream")
+def RealtimeSearchEngineStream(prompt):
+    key = answer_key(prompt)
+    cached = answer_cache.get(key)
+    if cached is not None:
+        yield cached
+        return cached
+
+    try:
+        answer = ""
+        for delta in chat_llm().stream(build_search_context(prompt), purpose="realtime", max_tokens=2048, temperature=0.7):
+            answer += delta
+            yield delta
 
         # ✅ No DB saving here anymore
+        cleaned = AnswerModifier(answer)
+        answer_cache.set(key, cleaned)
         return cleaned
 
     except Exception as e:
-        return f"❌ Error during real-time search: {e}"
+        error = f"❌ Error during real-time search: {e}"
+        yield error
+        return error
+
+# === Main Function ===
+# Concurrent identical queries share one upstream generation.
+@timed("realtime")
+def RealtimeSearchEngine(prompt):
+    key = answer_key(prompt)
+    cached = answer_cache.get(key)
+    if cached is not None:
+        return cached
+
+    def generate():
+        stream = RealtimeSearchEngineStream(prompt)
+        while True:
+            try:
+                next(stream)
+            except StopIteration as done:
+                return done.value
+
+    return answer_flight.do(key, generate)
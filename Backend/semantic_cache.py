@@ -0,0 +1,208 @@
+# ============================================
+# File: semantic_cache.py
+# Description: Opt-in near-duplicate answer cache for general Chat queries
+#
+# Queries are embedded on the CPU with feature hashing (word unigrams and
+# character trigrams into SEMANTIC_CACHE_DIM buckets, L2-normalised sparse
+# vectors). An inverted index from word to entries narrows the candidates, and
+# the best cosine match at or above SEMANTIC_CACHE_THRESHOLD is served.
+# A candidate must also carry the same negations, numbers and qualifiers
+# ("descending", "vs", "largest", ...) and its content words must be a
+# subset or superset of the query's; cosine alone scores "is a tomato a fruit"
+# and "is a tomato not a fruit" at 0.83.
+# Time-sensitive, first-person and follow-up queries are never cached.
+# ============================================
+
+import os
+import re
+import math
+import time
+import zlib
+import threading
+from collections import OrderedDict, defaultdict
+
+# === Load .env Variables ===
+SEMANTIC_CACHE_ENABLED = os.environ.get("SEMANTIC_CACHE", "0") == "1"
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", "0.85"))
+SEMANTIC_CACHE_SIZE = int(os.environ.get("SEMANTIC_CACHE_SIZE", "5000"))
+SEMANTIC_CACHE_TTL = int(os.environ.get("SEMANTIC_CACHE_TTL", str(24 * 3600)))
+SEMANTIC_CACHE_DIM = int(os.environ.get("SEMANTIC_CACHE_DIM", "4096"))
+
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "of", "to", "in", "on", "for",
+    "about", "tell", "me", "please", "can", "you", "could", "would", "what", "whats",
+    "do", "does", "did", "explain", "describe", "give", "some", "info", "information",
+    "jarvis", "hey", "hi", "and", "or", "with", "who", "which",
+    # Titles do not change who the question is about
+    "mahatma", "mr", "mrs", "ms", "dr", "sir", "shri", "sri", "lord",
+}
+
+# Words that flip or narrow the meaning; both queries must carry the same ones
+NEGATIONS = {"not", "no", "never", "without", "except", "nor", "none", "neither"}
+QUALIFIERS = {
+    "ascending", "descending", "reverse", "reversed", "vs", "versus", "difference", "compare",
+    "only", "first", "last", "best", "worst", "most", "least", "more", "less", "before", "after",
+    "largest", "smallest", "biggest", "highest", "lowest", "fastest", "slowest", "min", "max",
+    "minimum", "maximum", "opposite", "advantages", "disadvantages", "pros", "cons",
+}
+NUMBER_WORDS = {
+    "zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten",
+    "hundred", "thousand", "million", "billion", "half", "double", "twice",
+}
+
+# Answers to these depend on the clock, the news or the asking user
+TIME_SENSITIVE = re.compile(
+    r"\b(today|tonight|now|current(ly)?|latest|recent(ly)?|news|weather|temperature|"
+    r"time|date|day|yesterday|tomorrow|this (week|month|year)|price|stock|score|live|"
+    r"upcoming|trending|20\d\d)\b"
+)
+PERSONAL = re.compile(r"\b(i|i'm|im|my|mine|myself|we|our|us)\b")
+# Follow-ups lean on conversation memory, so the bare query is not self-contained
+FOLLOW_UP = re.compile(r"\b(he|she|him|his|her|hers|it|its|they|them|their|that|this|those|these)\b")
+WORD = re.compile(r"[a-z0-9']+")
+
+
+# ============================================
+# Embedding
+# ============================================
+
+def normalize(query):
+    return " ".join(WORD.findall(query.lower()))
+
+def _stem(word):
+    # Plural folding only ("rainbows" -> "rainbow"); enough for short questions
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+def content_words(text):
+    return [_stem(w) for w in text.split() if w not in STOPWORDS]
+
+def guard_tokens(text):
+    """Negations, numbers and qualifiers; a cached answer needs exactly the same set."""
+    guards = set()
+    for word in text.split():
+        if word in NEGATIONS or word.endswith("n't"):
+            guards.add("not")
+        elif word in QUALIFIERS or word in NUMBER_WORDS or any(c.isdigit() for c in word):
+            guards.add(word)
+    return frozenset(guards)
+
+def comparable(words, other):
+    return words <= other or other <= words
+
+def _bucket(feature):
+    return zlib.crc32(feature.encode()) % SEMANTIC_CACHE_DIM
+
+def embed(text):
+    """Sparse L2-normalised hashing embedding: {bucket: weight}."""
+    vector = defaultdict(float)
+    for word in content_words(text):
+        vector[_bucket("w:" + word)] += 1.0
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            vector[_bucket("c:" + padded[i:i + 3])] += 0.25
+    norm = math.sqrt(sum(v * v for v in vector.values()))
+    return {k: v / norm for k, v in vector.items()} if norm else {}
+
+def cosine(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+def cacheable(text):
+    return (bool(content_words(text)) and not TIME_SENSITIVE.search(text)
+            and not PERSONAL.search(text) and not FOLLOW_UP.search(text))
+
+
+# ============================================
+# Index
+# ============================================
+
+class SemanticCache:
+    def __init__(self, maxsize=SEMANTIC_CACHE_SIZE, ttl=SEMANTIC_CACHE_TTL, threshold=SEMANTIC_CACHE_THRESHOLD):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+        self._entries = OrderedDict()   # normalized query -> (vector, words, guards, answer, expires)
+        self._postings = defaultdict(set)   # content word -> normalized queries
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "skipped": 0, "stores": 0, "evictions": 0}
+
+    def lookup(self, query):
+        text = normalize(query)
+        if not cacheable(text):
+            with self._lock:
+                self.stats["skipped"] += 1
+            return None
+
+        vector = embed(text)
+        words = set(content_words(text))
+        guards = guard_tokens(text)
+        now = time.monotonic()
+        with self._lock:
+            candidates = set()
+            for word in words:
+                candidates |= self._postings.get(word, set())
+
+            best_key, best_score = None, self.threshold
+            for key in candidates:
+                entry_vector, entry_words, entry_guards, _, expires = self._entries[key]
+                if expires <= now or entry_guards != guards or not comparable(words, entry_words):
+                    continue
+                score = cosine(vector, entry_vector)
+                if score >= best_score:
+                    best_key, best_score = key, score
+
+            if best_key is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self.stats["hits"] += 1
+            return self._entries[best_key][3]
+
+    def store(self, query, answer):
+        text = normalize(query)
+        if not answer or not cacheable(text):
+            return
+        vector = embed(text)
+        words = set(content_words(text))
+        with self._lock:
+            if text in self._entries:
+                self._remove(text)
+            self._entries[text] = (vector, words, guard_tokens(text), answer, time.monotonic() + self.ttl)
+            for word in words:
+                self._postings[word].add(text)
+            self.stats["stores"] += 1
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+                self.stats["evictions"] += 1
+
+    def _remove(self, key):
+        _, words, _, _, _ = self._entries.pop(key)
+        for word in words:
+            keys = self._postings.get(word)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[word]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._postings.clear()
+
+    def snapshot(self):
+        with self._lock:
+            data = dict(self.stats, size=len(self._entries), enabled=int(SEMANTIC_CACHE_ENABLED))
+        lookups = data["hits"] + data["misses"]
+        data["hit_rate"] = data["hits"] / lookups if lookups else 0.0
+        return data
+
+
+semantic_cache = SemanticCache()
+
+
+def enabled_for(user):
+    """Cache is on globally (SEMANTIC_CACHE=1) and the user has not opted out."""
+    return SEMANTIC_CACHE_ENABLED and bool(user) and user.get("semantic_cache", True)
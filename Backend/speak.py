@@ -1,11 +1,226 @@
-# === Backend/speak.py (complete version) ===
+# === Backend/speak.py (cached, per-request TTS) ===
+import os
+import re
+import queue
 import asyncio
+import hashlib
+import tempfile
+import threading
 import edge_tts
+from Backend.metrics import timed, timed_stream
 
-async def generate_tts(text, filename="Data/speech.mp3", voice="en-CA-LiamNeural", rate="+10%"):
-    communicate = edge_tts.Communicate(text, voice=voice, rate=rate)
+# === TTS Settings ===
+DEFAULT_VOICE = "en-CA-LiamNeural"
+DEFAULT_RATE = "+10%"
+TTS_CACHE_DIR = os.environ.get("TTS_CACHE_DIR", os.path.join("Data", "tts_cache"))
+TTS_CACHE_MAX_MB = float(os.environ.get("TTS_CACHE_MAX_MB", "200"))
+TTS_TIMEOUT = float(os.environ.get("TTS_TIMEOUT", "60"))
+TTS_PARALLEL = int(os.environ.get("TTS_PARALLEL", "3"))             # segments in flight per request
+TTS_MAX_SEGMENTS = int(os.environ.get("TTS_MAX_SEGMENTS", "48"))    # segments in flight per process
+TTS_SEGMENT_CHARS = int(os.environ.get("TTS_SEGMENT_CHARS", "300"))
+# TTS_PROVIDER=stub replaces edge-tts with a local fake for load tests
+TTS_PROVIDER = os.environ.get("TTS_PROVIDER", "edge").lower()
+TTS_STUB_LATENCY_MS = float(os.environ.get("TTS_STUB_LATENCY_MS", "150"))
+TTS_STUB_BYTES_PER_CHAR = int(os.environ.get("TTS_STUB_BYTES_PER_CHAR", "80"))
+
+os.makedirs(TTS_CACHE_DIR, exist_ok=True)
+
+# === Local Stub (same save/stream surface as edge_tts.Communicate) ===
+class StubCommunicate:
+    def __init__(self, text, voice=DEFAULT_VOICE, rate=DEFAULT_RATE):
+        self.text = text
+        seed = hashlib.sha256(f"{voice}|{rate}|{text}".encode()).digest()
+        size = max(1, len(text)) * TTS_STUB_BYTES_PER_CHAR
+        self.audio = (seed * (size // len(seed) + 1))[:size]
+
+    async def stream(self):
+        await asyncio.sleep(TTS_STUB_LATENCY_MS / 1000)
+        for start in range(0, len(self.audio), 4096):
+            yield {"type": "audio", "data": self.audio[start:start + 4096]}
+
+    async def save(self, filename):
+        with open(filename, "wb") as f:
+            async for chunk in self.stream():
+                f.write(chunk["data"])
+
+def make_communicate(text, voice=DEFAULT_VOICE, rate=DEFAULT_RATE):
+    if TTS_PROVIDER == "stub":
+        return StubCommunicate(text, voice=voice, rate=rate)
+    return edge_tts.Communicate(text, voice=voice, rate=rate)
+
+async def generate_tts(text, filename="Data/speech.mp3", voice=DEFAULT_VOICE, rate=DEFAULT_RATE):
+    communicate = make_communicate(text, voice=voice, rate=rate)
     await communicate.save(filename)
 
-# ✅ This is the callable from Flask
-def speak_text(text, filename="Data/speech.mp3"):
-    asyncio.run(generate_tts(text, filename))
+# === Persistent Event Loop (one per process, shared by all requests) ===
+_loop = None
+_loop_lock = threading.Lock()
+
+def get_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="jarvis-tts-loop", daemon=True).start()
+    return _loop
+
+def run_async(coro, timeout=TTS_TIMEOUT):
+    return asyncio.run_coroutine_threadsafe(coro, get_loop()).result(timeout)
+
+# === Content-addressed Cache ===
+tts_stats = {"hits": 0, "misses": 0, "evictions": 0}
+_stats_lock = threading.Lock()
+_evict_lock = threading.Lock()
+
+def _count(key, n=1):
+    with _stats_lock:
+        tts_stats[key] += n
+
+def cache_path(text, voice=DEFAULT_VOICE, rate=DEFAULT_RATE):
+    digest = hashlib.sha256(f"{voice}|{rate}|{text}".encode()).hexdigest()
+    return os.path.join(TTS_CACHE_DIR, f"{digest}.mp3")
+
+def evict_cache(max_bytes=None):
+    """Delete least recently used audio files until the cache fits in max_bytes."""
+    max_bytes = TTS_CACHE_MAX_MB * 1024 * 1024 if max_bytes is None else max_bytes
+    with _evict_lock:
+        entries = []
+        for name in os.listdir(TTS_CACHE_DIR):
+            if not name.endswith(".mp3"):
+                continue
+            path = os.path.join(TTS_CACHE_DIR, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                _count("evictions")
+            except FileNotFoundError:
+                pass
+
+def _temp_file(path):
+    # Unique across threads and gunicorn workers; os.replace() then publishes it atomically
+    return tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+
+# ✅ This is the callable from Flask; returns the path of the audio file
+@timed("tts")
+def speak_text(text, filename=None, voice=DEFAULT_VOICE, rate=DEFAULT_RATE):
+    path = filename or cache_path(text, voice, rate)
+    if filename is None and os.path.exists(path):
+        os.utime(path)  # mark as recently used
+        _count("hits")
+        return path
+
+    _count("misses")
+    fd, tmp = _temp_file(path)
+    os.close(fd)
+    try:
+        run_async(generate_tts(text, tmp, voice, rate))
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+    if filename is None:
+        evict_cache()
+    return path
+
+
+# ============================================
+# Streaming Synthesis
+# ============================================
+
+_segment_slots = None   # process-wide cap, created on the TTS loop
+_DONE = object()
+
+def split_segments(text, max_chars=TTS_SEGMENT_CHARS):
+    """Split at sentence boundaries; the first sentence stands alone so playback starts early."""
+    sentences = [s for s in re.split(r"(?<=[.!?])\s+", text.strip()) if s]
+    if not sentences:
+        return []
+    segments = [sentences[0]]
+    current = ""
+    for sentence in sentences[1:]:
+        if current and len(current) + len(sentence) + 1 > max_chars:
+            segments.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}".strip()
+    if current:
+        segments.append(current)
+    return segments
+
+async def _stream_segment(text, voice, rate, out, request_slots):
+    try:
+        # Per-request slot first, so one long text can hold at most
+        # TTS_PARALLEL of the process-wide slots and never starves other requests
+        async with request_slots, _segment_slots:
+            communicate = make_communicate(text, voice=voice, rate=rate)
+            async for chunk in communicate.stream():
+                if chunk["type"] == "audio":
+                    out.put(chunk["data"])
+        out.put(_DONE)
+    except Exception as e:
+        out.put(e)
+
+async def _synthesize(segments, voice, rate, outputs):
+    global _segment_slots
+    if _segment_slots is None:
+        _segment_slots = asyncio.Semaphore(TTS_MAX_SEGMENTS)
+    request_slots = asyncio.Semaphore(TTS_PARALLEL)
+    await asyncio.gather(*(
+        _stream_segment(segment, voice, rate, out, request_slots)
+        for segment, out in zip(segments, outputs)
+    ))
+
+@timed_stream("tts_stream")
+def stream_speech(text, voice=DEFAULT_VOICE, rate=DEFAULT_RATE, chunk_size=16384):
+    """Yield MP3 bytes as they are synthesized; segments are synthesized in parallel
+    but emitted in order. The full audio is written to the cache when complete."""
+    path = cache_path(text, voice, rate)
+    if os.path.exists(path):
+        os.utime(path)
+        _count("hits")
+        with open(path, "rb") as cached:
+            while True:
+                data = cached.read(chunk_size)
+                if not data:
+                    return
+                yield data
+
+    _count("misses")
+    loop = get_loop()
+    segments = split_segments(text)
+    outputs = [queue.Queue() for _ in segments]
+    asyncio.run_coroutine_threadsafe(_synthesize(segments, voice, rate, outputs), loop)
+
+    audio = bytearray()
+    for out in outputs:
+        while True:
+            item = out.get(timeout=TTS_TIMEOUT)
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+            audio.extend(item)
+            yield item
+
+    tmp = None
+    try:
+        fd, tmp = _temp_file(path)
+        with os.fdopen(fd, "wb") as f:
+            f.write(audio)
+        os.replace(tmp, path)
+        evict_cache()
+    except OSError as e:
+        print(f"⚠️ Failed to cache streamed speech: {e}")
+        if tmp and os.path.exists(tmp):
+            os.remove(tmp)
@@ -0,0 +1,85 @@
+# ============================================
+# File: task_executor.py
+# Description: Runs the independent tasks of one FirstLayerDMM plan concurrently
+# ============================================
+
+import os
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# === Load .env Variables ===
+TASK_WORKERS = int(os.environ.get("TASK_WORKERS", "16"))
+TASK_CONCURRENCY = int(os.environ.get("TASK_CONCURRENCY", "4"))
+TASK_TIMEOUT = float(os.environ.get("TASK_TIMEOUT", "60"))
+
+# One pool per process, shared by all requests; TASK_CONCURRENCY caps how many
+# slots a single request may hold at once.
+_executor = ThreadPoolExecutor(max_workers=TASK_WORKERS, thread_name_prefix="jarvis-task")
+
+
+def execute_tasks(tasks, make_job, max_concurrency=TASK_CONCURRENCY, timeout=TASK_TIMEOUT):
+    """
+    Run `make_job(task)()` for every task and return (results, timings).
+
+    `make_job` is called on the caller's thread (so it can capture the Flask
+    request context); the returned callable runs on the pool. Results keep
+    the order of `tasks`. Each timing is {"task", "ms", "status"}.
+    """
+    results = [None] * len(tasks)
+    timings = [None] * len(tasks)
+    queue = list(enumerate(tasks))
+    pending = {}
+
+    while queue or pending:
+        while queue and len(pending) < max(1, max_concurrency):
+            index, task = queue.pop(0)
+            pending[_executor.submit(make_job(task))] = (index, time.perf_counter())
+
+        oldest = min(started for _, started in pending.values())
+        remaining = max(0.0, oldest + timeout - time.perf_counter())
+        done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+
+        now = time.perf_counter()
+        for future in done:
+            index, started = pending.pop(future)
+            status = "ok"
+            try:
+                results[index] = future.result()
+            except Exception as task_error:
+                status = "error"
+                results[index] = f"❌ Error in task '{tasks[index]}': {task_error}"
+            timings[index] = {"task": tasks[index], "ms": round((now - started) * 1000, 1), "status": status}
+
+        for future, (index, started) in list(pending.items()):
+            if now - started >= timeout:
+                pending.pop(future)
+                future.cancel()
+                results[index] = f"⏱️ Task '{tasks[index]}' timed out after {timeout:g}s."
+                timings[index] = {"task": tasks[index], "ms": round((now - started) * 1000, 1), "status": "timeout"}
+
+    return results, timings
+
+
+def start_tasks(tasks, make_job, max_concurrency=TASK_CONCURRENCY, timeout=TASK_TIMEOUT):
+    """
+    Start execute_tasks in the background and return a Future of (results,
+    timings). Jobs are built here, on the caller's thread, so they capture
+    its request context. The coordinating thread is not taken from the pool,
+    so it can never wait on jobs queued behind itself.
+    """
+    jobs = iter([make_job(task) for task in tasks])   # execute_tasks asks for jobs in task order
+    future = Future()
+
+    def coordinate():
+        try:
+            future.set_result(execute_tasks(tasks, lambda task: next(jobs), max_concurrency, timeout))
+        except Exception as e:
+            future.set_exception(e)
+
+    threading.Thread(target=coordinate, name="jarvis-task-batch", daemon=True).start()
+    return future
+
+
+def format_timings(timings):
+    return ", ".join(f"{t['task'][:40]!r}={t['ms']}ms ({t['status']})" for t in timings)
@@ -1,21 +1,31 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory, session, Response, redirect, url_for
-from Backend.chatbot import Chat
-from Backend.automation import WriteContent, GoogleSearch, YouTubeSearch, OpenSite, run_automation
-from Backend.realtimesearchengine import RealtimeSearchEngine
-from Backend.model import FirstLayerDMM
-from Backend.speak import speak_text
+from flask import Flask, render_template, request, jsonify, send_file, session, Response, redirect, url_for, stream_with_context, copy_current_request_context
+from Backend.chatbot import Chat, ChatStream
+from Backend.automation import WriteContent, WriteContentStream, GoogleSearch, YouTubeSearch, OpenSite, run_automation
+from Backend.realtimesearchengine import RealtimeSearchEngine, RealtimeSearchEngineStream, search_cache, answer_cache
+from Backend.model import FirstLayerDMM, dmm_cache, dmm_stats
+from Backend.speak import speak_text, stream_speech, tts_stats
+from Backend.semantic_cache import semantic_cache
+from Backend.memory import conversation_memory
+from Backend.rate_limit import limiter, rate_limited
+from Backend import metrics, fast_classifier, password_pool
+from Backend.task_executor import execute_tasks, start_tasks, format_timings
+from Backend.password_pool import HasherBusy
 from Backend.auth_manager import (
     signup_flow, login_flow, logout_flow,
     forgot_password_flow, reset_password_flow, verify_otp_flow
 )
 from jarvis_db import (
-    init_db, get_user_by_name, update_session_login, update_session_logout,
-    store_chat, get_chat_history, get_file_by_name,
-    get_all_users, delete_user
+    init_db, get_user_identity,
+    get_chat_page, search_chats, get_user_files, get_file_blob, iter_file_content,
+    get_all_users, delete_user, user_cache, set_semantic_cache
 )
+from db_pool import pool_stats
+from chat_queue import enqueue_chat, chat_writer
 from datetime import timedelta
 from dotenv import dotenv_values
+import json
 import os
+import time
 
 SECRET_KEY = os.environ.get("FLASK_SECRET")
 
@@ -25,21 +35,131 @@ app.secret_key = SECRET_KEY
 app.permanent_session_lifetime = timedelta(days=30)
 app.static_folder = 'static'
 
+# === Metrics (/metrics, per-request timing logs) ===
+metrics.init_app(app)
+metrics.register_gauges("db_pool", pool_stats)
+metrics.register_gauges("chat_queue", chat_writer.snapshot)
+metrics.register_gauges("user_cache", user_cache.snapshot)
+metrics.register_gauges("dmm_cache", dmm_cache.snapshot)
+metrics.register_gauges("dmm", lambda: dmm_stats)
+metrics.register_gauges("dmm_fastpath", lambda: dict(fast_classifier.stats, hit_rate=fast_classifier.hit_rate()))
+metrics.register_gauges("search_cache", search_cache.snapshot)
+metrics.register_gauges("answer_cache", answer_cache.snapshot)
+metrics.register_gauges("tts_cache", lambda: tts_stats)
+metrics.register_gauges("semantic_cache", semantic_cache.snapshot)
+metrics.register_gauges("memory", conversation_memory.snapshot)
+metrics.register_gauges("rate_limit", limiter.snapshot)
+metrics.register_gauges("password_pool", lambda: dict(password_pool.stats, pending=password_pool.queue_depth()))
+
+@app.route("/metrics")
+def metrics_route():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
 # === Initialize Database ===
 try:
     init_db()
 except Exception as e:
     print(f"❌ Failed to initialize DB on app start: {e}")
 
+# === Session Identity ===
+# The signed session carries the user id so requests never re-resolve the user row.
+def start_session(username):
+    session["username"] = username
+    user = get_user_identity(username)
+    session["user_id"] = user["id"] if user else None
+
+def current_user_id():
+    user_id = session.get("user_id")
+    if user_id is None and "username" in session:
+        # Sessions issued before user_id was stored: resolve once and remember
+        user = get_user_identity(session["username"])
+        if user:
+            user_id = session["user_id"] = user["id"]
+    return user_id
+
 # === Home Page ===
 @app.route("/")
 def index():
     username = session.get("username")
-    chat_history = get_chat_history(username) if username else []
-    return render_template("index.html", chat_history=chat_history, username=username)
+    user_id = current_user_id()
+    chat_history, history_cursor = get_chat_page(user_id) if user_id else ([], None)
+    return render_template("index.html", chat_history=chat_history, history_cursor=history_cursor, username=username)
+
+# === Older Chat History (keyset pagination) ===
+@app.route("/history")
+def history():
+    if "username" not in session:
+        return jsonify({"error": "❌ Please login first."}), 401
+
+    before = request.args.get("before")
+    limit = request.args.get("limit", 50, type=int)
+    user_id = current_user_id()
+    if not user_id:
+        return jsonify({"messages": [], "next_cursor": None})
+    messages, next_cursor = get_chat_page(user_id, before=before, limit=limit)
+    return jsonify({
+        "messages": [
+            {"message": m["message"], "response": m["response"], "timestamp": str(m["timestamp"])}
+            for m in messages
+        ],
+        "next_cursor": next_cursor
+    })
+
+# === Search Chat History (full-text, ranked) ===
+@app.route("/history/search")
+def history_search():
+    if "username" not in session:
+        return jsonify({"error": "❌ Please login first."}), 401
+
+    query = request.args.get("q", "").strip()
+    if not query:
+        return jsonify({"error": "❌ Missing search query."}), 400
+
+    after = request.args.get("after")
+    limit = request.args.get("limit", 20, type=int)
+    user_id = current_user_id()
+    if not user_id:
+        return jsonify({"hits": [], "next_cursor": None})
+    hits, next_cursor = search_chats(user_id, query, after=after, limit=limit)
+    return jsonify({
+        "hits": [dict(hit, timestamp=str(hit["timestamp"])) for hit in hits],
+        "next_cursor": next_cursor
+    })
+
+# === Task Dispatch ===
+def run_task(task, user_input):
+    if task.startswith("content"):
+        return WriteContent(task)
+    elif task.startswith("google search"):
+        return GoogleSearch(task.replace("google search ", ""))
+    elif task.startswith(("youtube search", "play")):
+        return YouTubeSearch(task.replace("youtube search ", "").replace("play ", ""))
+    elif task.startswith("open"):
+        return OpenSite(task.replace("open ", ""))
+    elif task.startswith(("realtime", "real info")):
+        return RealtimeSearchEngine(user_input)
+    elif task.startswith(("system", "close", "reminder")):
+        return run_automation(task)
+    return Chat(user_input)
+
+# Streaming counterpart of run_task: yields deltas, returns the final answer.
+def stream_task(task, user_input):
+    if task.startswith("content"):
+        return (yield from WriteContentStream(task))
+    elif task.startswith(("realtime", "real info")):
+        return (yield from RealtimeSearchEngineStream(user_input))
+    elif task.startswith(("google search", "youtube search", "play", "open", "system", "close", "reminder")):
+        result = run_task(task, user_input)
+        yield result
+        return result
+    return (yield from ChatStream(user_input))
+
+def sse_event(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
 
 # === Chat Route ===
 @app.route("/ask", methods=["POST"])
+@rate_limited("ask")
 def ask():
     if "username" not in session:
         return jsonify({"response": "❌ Please login first."}), 401
@@ -48,43 +168,110 @@ def ask():
     if not user_input:
         return jsonify({"response": "⚠️ Empty message received."})
 
-    username = session["username"]
+    user_id = current_user_id()
+    timings = []
     try:
         if user_input.lower().startswith(("write ", "generate ")):
             response = WriteContent(user_input)
         else:
+            dmm_start = time.perf_counter()
             tasks = FirstLayerDMM(user_input)
-            responses = []
-            for task in tasks:
-                try:
-                    if task.startswith("content"):
-                        responses.append(WriteContent(task))
-                    elif task.startswith("google search"):
-                        responses.append(GoogleSearch(task.replace("google search ", "")))
-                    elif task.startswith(("youtube search", "play")):
-                        responses.append(YouTubeSearch(task.replace("youtube search ", "").replace("play ", "")))
-                    elif task.startswith("open"):
-                        responses.append(OpenSite(task.replace("open ", "")))
-                    elif task.startswith(("realtime", "real info")):
-                        responses.append(RealtimeSearchEngine(user_input))
-                    elif task.startswith(("system", "close", "reminder")):
-                        responses.append(run_automation(task))
-                    else:
-                        responses.append(Chat(user_input))
-                except Exception as task_error:
-                    responses.append(f"❌ Error in task '{task}': {task_error}")
+            dmm_ms = round((time.perf_counter() - dmm_start) * 1000, 1)
+            responses, timings = execute_tasks(
+                tasks,
+                lambda task: copy_current_request_context(lambda: run_task(task, user_input))
+            )
+            timings.insert(0, {"task": "dmm", "ms": dmm_ms, "status": "ok"})
+            print(f"⏱️ /ask tasks: {format_timings(timings)}")
             response = "\n\n".join(responses)
 
-        user = get_user_by_name(username)
-        if user:
-            store_chat(user["id"], username, user_input, response)
+        saved = False
+        if user_id:
+            # False when the row could not be queued, or (CHAT_WRITE_MODE=ack) committed
+            saved = enqueue_chat(user_id, user_input, response)
+            conversation_memory.remember(user_id, user_input, response)
 
-        return jsonify({"response": response})
+        return jsonify({"response": response, "timings": timings, "saved": saved})
     except Exception as e:
         return jsonify({"response": f"❌ Internal error: {e}"}), 500
 
+# === Streaming Chat Route (Server-Sent Events) ===
+@app.route("/ask/stream", methods=["POST"])
+@rate_limited("ask")
+def ask_stream():
+    if "username" not in session:
+        return jsonify({"response": "❌ Please login first."}), 401
+
+    user_input = request.json.get("message", "").strip()
+    if not user_input:
+        return jsonify({"response": "⚠️ Empty message received."})
+
+    user_id = current_user_id()
+
+    @metrics.timed_stream("ask_stream")
+    def generate():
+        try:
+            timings = []
+            if user_input.lower().startswith(("write ", "generate ")):
+                tasks = [user_input]
+                first_stream = WriteContentStream(user_input)
+            else:
+                dmm_start = time.perf_counter()
+                tasks = FirstLayerDMM(user_input) or [user_input]
+                timings.append({"task": "dmm", "ms": round((time.perf_counter() - dmm_start) * 1000, 1), "status": "ok"})
+                first_stream = stream_task(tasks[0], user_input)
+
+            # Later tasks run concurrently on the task executor while the first
+            # one streams; their output is emitted afterwards in plan order.
+            rest = None
+            if len(tasks) > 1:
+                rest = start_tasks(
+                    tasks[1:],
+                    lambda task: copy_current_request_context(lambda: run_task(task, user_input))
+                )
+
+            responses = []
+            first_start = time.perf_counter()
+            status = "ok"
+            try:
+                while True:
+                    yield sse_event("delta", {"text": next(first_stream)})
+            except StopIteration as done:
+                responses.append(done.value)
+            except Exception as task_error:
+                status = "error"
+                error = f"❌ Error in task '{tasks[0]}': {task_error}"
+                responses.append(error)
+                yield sse_event("delta", {"text": error})
+            timings.append({"task": tasks[0], "ms": round((time.perf_counter() - first_start) * 1000, 1), "status": status})
+
+            if rest is not None:
+                rest_responses, rest_timings = rest.result()
+                for result in rest_responses:
+                    responses.append(result)
+                    yield sse_event("delta", {"text": "\n\n" + str(result)})
+                timings.extend(rest_timings)
+            print(f"⏱️ /ask/stream tasks: {format_timings(timings)}")
+            response = "\n\n".join(responses)
+
+            saved = False
+            if user_id:
+                saved = enqueue_chat(user_id, user_input, response)
+                conversation_memory.remember(user_id, user_input, response)
+
+            yield sse_event("done", {"response": response, "saved": saved, "timings": timings})
+        except Exception as e:
+            yield sse_event("done", {"response": f"❌ Internal error: {e}"})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # === Speak Route ===
 @app.route("/speak", methods=["POST"])
+@rate_limited("speak")
 def speak_route():
     if "username" not in session:
         return jsonify({"error": "❌ Please login first."}), 401
@@ -94,11 +281,31 @@ def speak_route():
         return jsonify({"error": "Empty text"}), 400
 
     try:
-        speak_text(message)
-        return send_from_directory("Data", "speech.mp3")
+        path = speak_text(message)
+        return send_file(path, mimetype="audio/mpeg", conditional=True)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# === Streaming Speak Route (chunked MP3) ===
+@app.route("/speak/stream", methods=["POST"])
+@rate_limited("speak")
+def speak_stream_route():
+    if "username" not in session:
+        return jsonify({"error": "❌ Please login first."}), 401
+
+    message = request.json.get("text", "").strip()
+    if not message:
+        return jsonify({"error": "Empty text"}), 400
+
+    return Response(stream_speech(message), mimetype="audio/mpeg", headers={"Cache-Control": "no-cache"})
+
+# === Password Pool Saturated ===
+def server_busy():
+    response = jsonify({"status": "error", "message": "⏳ Server is busy. Please try again in a moment."})
+    response.status_code = 503
+    response.headers["Retry-After"] = "1"
+    return response
+
 # === Signup Route ===
 @app.route("/signup", methods=["POST"])
 def signup():
@@ -110,15 +317,18 @@ def signup():
     if not email or not username or not password:
         return jsonify({"status": "error", "message": "Email, username, and password required."}), 400
 
-    success, message = signup_flow(email, username, password)
+    try:
+        success, message = signup_flow(email, username, password)
+    except HasherBusy:
+        return server_busy()
     if success:
-        session["username"] = username
-        update_session_login(username)
+        start_session(username)  # save_user already marked the session row
         return jsonify({"status": "success", "message": "✅ Signup successful and logged in."})
     return jsonify({"status": "error", "message": message}), 400
 
 # === Login Route ===
 @app.route("/login", methods=["POST"])
+@rate_limited("login", account_field="identifier", account_per_ip=True)
 def login():
     data = request.json
     identifier = data.get("identifier", "").strip()
@@ -127,10 +337,12 @@ def login():
     if not identifier or not password:
         return jsonify({"status": "error", "message": "📛 Identifier and password are required."}), 400
 
-    success, result = login_flow(identifier, password)
+    try:
+        success, result = login_flow(identifier, password)
+    except HasherBusy:
+        return server_busy()
     if success:
-        session["username"] = result
-        update_session_login(result)
+        start_session(result)  # login_flow already upserted the session row
         return jsonify({"status": "success", "message": f"✅ {result} logged in successfully."})
     return jsonify({"status": "error", "message": result}), 401
 
@@ -138,10 +350,10 @@ def login():
 @app.route("/logout", methods=["POST"])
 def logout():
     username = session.pop("username", None)
+    session.pop("user_id", None)
     session.pop("admin", None)
     if username:
         logout_flow(username)
-        update_session_logout(username)
         return jsonify({"status": "success", "message": "✅ Logged out successfully."})
     return jsonify({"status": "error", "message": "No active session."})
 
@@ -150,29 +362,78 @@ def logout():
 def get_active_user():
     return jsonify({"username": session.get("username")})
 
+# === Semantic Cache Preference (per-user opt-out) ===
+@app.route("/settings/semantic_cache", methods=["GET", "POST"])
+def semantic_cache_setting():
+    if "username" not in session:
+        return jsonify({"error": "❌ Please login first."}), 401
+
+    username = session["username"]
+    if request.method == "POST":
+        enabled = bool((request.get_json(silent=True) or {}).get("enabled", True))
+        if not set_semantic_cache(username, enabled):
+            return jsonify({"error": "❌ Could not update preference."}), 500
+    user = get_user_identity(username)
+    return jsonify({"enabled": bool(user and user.get("semantic_cache", True))})
+
+# === File Listing (keyset pagination) ===
+@app.route("/files")
+def list_files():
+    if "username" not in session:
+        return jsonify({"error": "❌ Please login first."}), 401
+
+    before = request.args.get("before")
+    limit = request.args.get("limit", 50, type=int)
+    user_id = current_user_id()
+    if not user_id:
+        return jsonify({"files": [], "next_cursor": None})
+    files, next_cursor = get_user_files(user_id, before=before, limit=limit)
+    return jsonify({
+        "files": [
+            {
+                "filename": f["filename"],
+                "size": f["size"],
+                "created_at": str(f["created_at"]),
+                "url": url_for("download", filename=f["filename"])
+            }
+            for f in files
+        ],
+        "next_cursor": next_cursor
+    })
+
 # === File Download ===
 @app.route("/download/<filename>")
 def download(filename):
     if "username" not in session:
         return "❌ Please login first.", 401
 
-    username = session["username"]
-    user = get_user_by_name(username)
-    if not user:
+    user_id = current_user_id()
+    if not user_id:
         return "❌ User not found.", 404
 
-    content = get_file_by_name(user["id"], filename)
-    if not content:
+    record = get_file_blob(user_id, filename)
+    if not record:
         return "❌ File not found.", 404
 
-    return Response(
-        content,
+    # Decompressed while streaming; the content hash is a strong ETag, and
+    # make_conditional answers Range / If-None-Match requests from it.
+    response = Response(
+        iter_file_content(record),
         mimetype="text/plain",
         headers={"Content-Disposition": f"attachment;filename={filename}"}
     )
+    response.content_length = record["size"]
+    response.set_etag(record["hash"])
+    if record["created_at"]:
+        response.last_modified = record["created_at"]
+    # Always revalidate; an unchanged file costs one metadata query and a 304
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request, accept_ranges=True, complete_length=record["size"])
 
 # === Forgot Password ===
 @app.route("/forgot_password", methods=["POST"])
+@rate_limited("forgot_password", account_field="username")
 def forgot_password():
     username = request.json.get("username", "").strip()
     if not username:
@@ -207,7 +468,11 @@ def reset_password():
     if not username or not otp or not new_password:
         return jsonify({"status": "error", "message": "All fields are required."}), 400
 
-    if reset_password_flow(username, otp, new_password):
+    try:
+        reset_ok = reset_password_flow(username, otp, new_password)
+    except HasherBusy:
+        return server_busy()
+    if reset_ok:
         return jsonify({"status": "success", "message": "✅ Password reset successful."})
     return jsonify({"status": "error", "message": "❌ Invalid or expired OTP."}), 400
 
@@ -220,7 +485,10 @@ def admin_login():
         identifier = data.get("username", "").strip()
         password = data.get("password", "").strip()
 
-        success, result = login_flow(identifier, password)
+        try:
+            success, result = login_flow(identifier, password)
+        except HasherBusy:
+            return server_busy()
         if success and result == "admin":
             session["admin"] = True
             return jsonify({"status": "success", "message": "✅ Admin logged in."})
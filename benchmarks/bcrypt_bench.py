@@ -0,0 +1,43 @@
+# ============================================
+# File: benchmarks/bcrypt_bench.py
+# Description: bcrypt hashes/sec per core for a range of cost factors
+# Usage: python benchmarks/bcrypt_bench.py [--costs 10 11 12 13] [--seconds 3] [--workers N]
+# ============================================
+
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Backend.password_pool import _hash
+
+
+def hashes_in(seconds, rounds):
+    count = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        _hash("correct horse battery staple", rounds)
+        count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--costs", type=int, nargs="+", default=[10, 11, 12, 13])
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    print(f"{'cost':>4} | {'ms/hash':>8} | {'hashes/s/core':>13} | {'hashes/s ({} procs)'.format(args.workers):>20}")
+    print("-" * 56)
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for rounds in args.costs:
+            single = hashes_in(args.seconds, rounds) / args.seconds
+            total = sum(pool.map(hashes_in, [args.seconds] * args.workers, [rounds] * args.workers)) / args.seconds
+            print(f"{rounds:>4} | {1000 / single:>8.1f} | {single:>13.2f} | {total:>20.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+# ============================================
+# File: benchmarks/load_bench.py
+# Description: End-to-end load/latency benchmark for the Flask routes
+#
+# Boots `app` in-process with stubbed LLM, search and TTS providers against a
+# local throwaway PostgreSQL (PG_* variables, e.g. `docker run -p 5432:5432
+# -e POSTGRES_PASSWORD=bench postgres:16`), then drives /login, /, /ask,
+# /speak and /download from N concurrent virtual users.
+#
+# Usage:
+#   python benchmarks/load_bench.py --users 20 --iterations 25
+#   python benchmarks/load_bench.py --users 50 --compare benchmarks/results/<old>.json
+#   python benchmarks/load_bench.py --url http://127.0.0.1:8000   # drive an external server
+#
+# Results (per-route and per-stage p50/p95/p99 + throughput) are written as
+# JSON to benchmarks/results/ for regression comparison between commits.
+# ============================================
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import threading
+import subprocess
+import http.cookiejar
+import urllib.error
+import urllib.request
+from datetime import datetime
+from collections import defaultdict
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+PROMPTS = [
+    "hello",
+    "open youtube",
+    "who is mahatma gandhi",
+    "what is the weather today",
+    "open facebook and open instagram",
+    "write a poem about the sea",
+]
+
+
+# ============================================
+# Clients (in-process test client or real HTTP)
+# ============================================
+
+class InProcessClient:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, payload=None):
+        response = self.client.open(path, method=method, json=payload)
+        body = response.get_data()
+        return response.status_code, body
+
+
+class HttpClient:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def request(self, method, path, payload=None):
+        data = json.dumps(payload).encode() if payload is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method)
+        if data is not None:
+            req.add_header("Content-Type", "application/json")
+        try:
+            with self.opener.open(req, timeout=120) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+
+# ============================================
+# Recording
+# ============================================
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.routes = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.stages = defaultdict(list)
+
+    def timed(self, client, route, method, path, payload=None):
+        start = time.perf_counter()
+        status, body = client.request(method, path, payload)
+        elapsed = (time.perf_counter() - start) * 1000
+        with self.lock:
+            self.routes[route].append(elapsed)
+            if status >= 400:
+                self.errors[route] += 1
+        return status, body
+
+    def stage(self, name, ms):
+        with self.lock:
+            self.stages[name].append(ms)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round((len(ordered) - 1) * pct / 100)))]
+
+
+def summarize(samples, wall_seconds, errors=None):
+    summary = {}
+    for name, values in sorted(samples.items()):
+        summary[name] = {
+            "count": len(values),
+            "errors": (errors or {}).get(name, 0),
+            "rps": round(len(values) / wall_seconds, 2) if wall_seconds else 0.0,
+            "mean_ms": round(sum(values) / len(values), 2) if values else 0.0,
+            "p50_ms": round(percentile(values, 50), 2),
+            "p95_ms": round(percentile(values, 95), 2),
+            "p99_ms": round(percentile(values, 99), 2),
+        }
+    return summary
+
+
+# ============================================
+# Virtual User
+# ============================================
+
+def virtual_user(index, client, recorder, iterations, run_id):
+    username = f"bench_{run_id}_{index}"
+    password = "bench-password"
+    client.request("POST", "/signup", {"email": f"{username}@example.com", "username": username, "password": password})
+    client.request("POST", "/logout")
+    recorder.timed(client, "/login", "POST", "/login", {"identifier": username, "password": password})
+
+    download_path = None
+    for step in range(iterations):
+        recorder.timed(client, "/", "GET", "/")
+
+        prompt = PROMPTS[(index + step) % len(PROMPTS)]
+        status, body = recorder.timed(client, "/ask", "POST", "/ask", {"message": prompt})
+        if status == 200:
+            data = json.loads(body)
+            for timing in data.get("timings", []):
+                recorder.stage(timing["task"].split(" ")[0], timing["ms"])
+            link = re.search(r"href='(/download/[^']+)'", data.get("response", ""))
+            if link:
+                download_path = link.group(1)
+            recorder.timed(client, "/speak", "POST", "/speak", {"text": data.get("response", "")[:400]})
+
+        if download_path:
+            recorder.timed(client, "/download", "GET", download_path)
+
+
+# ============================================
+# Setup
+# ============================================
+
+def configure_stubs(args):
+    os.environ.setdefault("LLM_PROVIDER", "stub")
+    os.environ.setdefault("TTS_PROVIDER", "stub")
+    os.environ.setdefault("LLM_STUB_LATENCY_MS", str(args.llm_latency_ms))
+    os.environ.setdefault("BCRYPT_ROUNDS", str(args.bcrypt_rounds))
+    os.environ.setdefault("FLASK_SECRET", "bench-secret")
+    # Every virtual user shares one IP; measure the app, not the limiter
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+    os.environ.setdefault("TTS_CACHE_DIR", os.path.join(ROOT, "Data", "tts_cache_bench"))
+
+
+def load_app(args):
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+    from Backend.realtimesearchengine import set_search_provider, FakeSearchProvider
+    set_search_provider(FakeSearchProvider(delay=args.search_latency_ms / 1000))
+    from app import app
+    return app
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def compare(current, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nΔ vs {baseline['meta'].get('commit')} ({baseline_path})")
+    for section in ("routes", "stages"):
+        for name, stats in current[section].items():
+            old = baseline.get(section, {}).get(name)
+            if not old:
+                continue
+            for key in ("p50_ms", "p95_ms", "p99_ms", "rps"):
+                if old[key]:
+                    change = (stats[key] - old[key]) / old[key] * 100
+                    print(f"  {section[:-1]} {name:<10} {key:<7} {old[key]:>9.2f} -> {stats[key]:>9.2f} ({change:+.1f}%)")
+
+
+def print_table(title, summary):
+    print(f"\n{title}")
+    print(f"  {'name':<12} {'count':>6} {'err':>4} {'rps':>8} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for name, s in summary.items():
+        print(f"  {name:<12} {s['count']:>6} {s['errors']:>4} {s['rps']:>8.2f} "
+              f"{s['p50_ms']:>8.1f}ms {s['p95_ms']:>8.1f}ms {s['p99_ms']:>8.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load/latency benchmark for the Flask routes")
+    parser.add_argument("--users", type=int, default=10, help="concurrent virtual users")
+    parser.add_argument("--iterations", type=int, default=20, help="ask/speak/download loops per user")
+    parser.add_argument("--url", help="drive an already running server instead of the in-process app")
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--search-latency-ms", type=float, default=100)
+    parser.add_argument("--bcrypt-rounds", type=int, default=4)
+    parser.add_argument("--output", help="result JSON path (default: benchmarks/results/<time>-<commit>.json)")
+    parser.add_argument("--compare", help="previous result JSON to diff against")
+    args = parser.parse_args()
+
+    if args.url:
+        make_client = lambda: HttpClient(args.url)
+    else:
+        configure_stubs(args)
+        app = load_app(args)
+        make_client = lambda: InProcessClient(app)
+
+    recorder = Recorder()
+    run_id = f"{int(time.time())}{os.getpid()}"
+    threads = [
+        threading.Thread(target=virtual_user, args=(i, make_client(), recorder, args.iterations, run_id))
+        for i in range(args.users)
+    ]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+
+    result = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(),
+            "users": args.users,
+            "iterations": args.iterations,
+            "mode": "http" if args.url else "in-process",
+            "llm_latency_ms": args.llm_latency_ms,
+            "search_latency_ms": args.search_latency_ms,
+            "wall_seconds": round(wall, 2),
+        },
+        "routes": summarize(recorder.routes, wall, recorder.errors),
+        "stages": summarize(recorder.stages, wall),
+    }
+
+    print_table("Routes", result["routes"])
+    print_table("Backend stages (/ask)", result["stages"])
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{result['meta']['commit']}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"\n💾 Results saved to {output}")
+
+    if args.compare:
+        compare(result, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# ============================================
+# File: benchmarks/login_bench.py
+# Description: DB round trips and latency per login_flow call against a real PostgreSQL
+# Usage: python benchmarks/login_bench.py [--iterations 200] [--rounds 4]
+#   Uses the PG_* variables; creates and deletes a throwaway user.
+# ============================================
+
+import os
+import sys
+import time
+import argparse
+import statistics
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--iterations", type=int, default=200)
+parser.add_argument("--rounds", type=int, default=4, help="bcrypt cost, low by default to isolate DB cost")
+args = parser.parse_args()
+os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+os.environ.setdefault("BCRYPT_WORKERS", "0")
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import psycopg2.extensions
+import db_pool
+
+
+class CountingCursor(psycopg2.extensions.cursor):
+    queries = 0
+
+    def execute(self, query, vars=None):
+        CountingCursor.queries += 1
+        return super().execute(query, vars)
+
+
+# Route every pooled connection through the counting cursor
+db_pool._pool = db_pool.ConnectionPool(cursor_factory=CountingCursor, **db_pool.DB_CONFIG)
+db_pool._pool_pid = os.getpid()
+
+from jarvis_db import init_db, delete_user
+from Backend.auth_manager import save_user, login_flow
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    init_db()
+    username = f"bench_login_{os.getpid()}"
+    email = f"{username}@example.com"
+    password = "bench-password"
+    save_user(email, username, password)
+
+    try:
+        for identifier, label in ((username, "username"), (email.upper(), "email")):
+            timings = []
+            CountingCursor.queries = 0
+            for _ in range(args.iterations):
+                start = time.perf_counter()
+                ok, _ = login_flow(identifier, password)
+                timings.append((time.perf_counter() - start) * 1000)
+                assert ok, "login failed"
+            print(
+                f"login by {label:<8} | queries/login {CountingCursor.queries / args.iterations:.2f} | "
+                f"p50 {statistics.median(timings):.2f} ms | p95 {percentile(timings, 95):.2f} ms | "
+                f"p99 {percentile(timings, 99):.2f} ms"
+            )
+    finally:
+        delete_user(username)
+        print(f"pool: {db_pool.pool_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# ============================================
+# File: benchmarks/search_bench.py
+# Description: /history/search query latency on a synthetic chats table
+#
+# Builds a throwaway `search_bench` schema in the PG_* database holding
+# --rows synthetic chats (default 1,000,000) spread over --users users, with
+# the same trigger-maintained tsvector and GIN index as jarvis_db, then times
+# jarvis_db.search_chats against an ILIKE scan of the same rows.
+#
+# Usage: python benchmarks/search_bench.py [--rows 1000000] [--users 1000] [--keep]
+# ============================================
+
+import os
+import sys
+import time
+import random
+import argparse
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(__file__))
+
+import db_pool
+import jarvis_db
+from load_bench import percentile
+
+SCHEMA = "search_bench"
+VOCABULARY = (
+    "python flask postgres index query gandhi india history river mountain weather "
+    "recipe pasta guitar chord poem ocean planet rocket satellite football cricket "
+    "election budget tax invoice email letter resume interview algorithm sorting "
+    "graph network router kernel memory cache latency database backup migration"
+).split()
+QUERIES = ["gandhi", "postgres index", "rocket satellite", "resume interview", "\"sorting algorithm\"", "cricket -football"]
+
+
+def setup(cursor, rows, users):
+    cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    cursor.execute(f"CREATE SCHEMA {SCHEMA}")
+    cursor.execute(f"SET search_path = {SCHEMA}")
+    cursor.execute("CREATE TABLE users (id TEXT PRIMARY KEY)")
+    cursor.execute("""
+        CREATE TABLE chats (
+            id SERIAL PRIMARY KEY,
+            user_id TEXT NOT NULL REFERENCES users(id),
+            message TEXT NOT NULL,
+            response TEXT NOT NULL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            search_vector TSVECTOR
+        )
+    """)
+    cursor.execute("INSERT INTO users SELECT 'u' || g FROM generate_series(1, %s) g", (users,))
+
+    # The trigger goes in before the load so rows are vectorised like live writes
+    for statement in jarvis_db.SEARCH_SETUP_STATEMENTS[:3]:
+        cursor.execute(statement)
+
+    start = time.perf_counter()
+    cursor.execute("""
+        WITH words AS (SELECT %(vocab)s::text[] AS w)
+        INSERT INTO chats (user_id, message, response, timestamp)
+        SELECT 'u' || (1 + g %% %(users)s),
+               (SELECT string_agg(w[1 + floor(random() * array_length(w, 1))::int], ' ')
+                FROM generate_series(1, 6 + (g %% 3)) WHERE g > 0),
+               (SELECT string_agg(w[1 + floor(random() * array_length(w, 1))::int], ' ')
+                FROM generate_series(1, 40 + (g %% 20)) WHERE g > 0),
+               now() - (g || ' seconds')::interval
+        FROM generate_series(1, %(rows)s) g, words
+    """, {"vocab": VOCABULARY, "users": users, "rows": rows})
+    print(f"📥 Loaded {rows} chats in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    cursor.execute(jarvis_db.SEARCH_SETUP_STATEMENTS[3].format(concurrently=""))
+    cursor.execute("CREATE INDEX ON chats (user_id, timestamp DESC, id DESC)")
+    print(f"🗂️ Built indexes in {time.perf_counter() - start:.1f}s")
+    cursor.execute("ANALYZE chats")
+
+
+def time_calls(fn, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Full-text chat search benchmark")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--keep", action="store_true", help="keep the search_bench schema afterwards")
+    args = parser.parse_args()
+
+    db_pool._pool = db_pool.ConnectionPool(options=f"-c search_path={SCHEMA}", **db_pool.DB_CONFIG)
+    db_pool._pool_pid = os.getpid()
+
+    with db_pool.db_connection() as conn, conn.cursor() as cursor:
+        setup(cursor, args.rows, args.users)
+
+    rng = random.Random(42)
+    print(f"\n  {'query':<22} {'engine':<8} {'hits':>5} {'p50':>9} {'p95':>9}")
+    for query in QUERIES:
+        user_ids = [f"u{rng.randint(1, args.users)}" for _ in range(args.iterations)]
+
+        counts = []
+        def fts():
+            hits, _ = jarvis_db.search_chats(user_ids[len(counts) % len(user_ids)], query)
+            counts.append(len(hits))
+        samples = time_calls(fts, args.iterations)
+        print(f"  {query:<22} {'tsvector':<8} {sum(counts) / len(counts):>5.1f} "
+              f"{percentile(samples, 50):>7.2f}ms {percentile(samples, 95):>7.2f}ms")
+
+        term = query.strip('"').split()[0]
+        scanned = []
+        def ilike():
+            with db_pool.db_connection() as conn, conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT id FROM chats
+                    WHERE user_id = %s AND (message ILIKE %s OR response ILIKE %s)
+                    ORDER BY timestamp DESC LIMIT 20
+                """, (user_ids[len(scanned) % len(user_ids)], f"%{term}%", f"%{term}%"))
+                scanned.append(len(cursor.fetchall()))
+        samples = time_calls(ilike, args.iterations)
+        print(f"  {'':<22} {'ilike':<8} {sum(scanned) / len(scanned):>5.1f} "
+              f"{percentile(samples, 50):>7.2f}ms {percentile(samples, 95):>7.2f}ms")
+
+    # Global (no user filter) match count shows what the GIN index alone has to cover
+    with db_pool.db_connection() as conn, conn.cursor() as cursor:
+        start = time.perf_counter()
+        cursor.execute("SELECT count(*) FROM chats WHERE search_vector @@ websearch_to_tsquery('english', 'gandhi')")
+        total = cursor.fetchone()[0]
+        print(f"\n  all-user matches for 'gandhi': {total} ({(time.perf_counter() - start) * 1000:.1f}ms)")
+
+        if not args.keep:
+            cursor.execute(f"DROP SCHEMA {SCHEMA} CASCADE")
+    db_pool.close_pool()
+
+
+if __name__ == "__main__":
+    main()
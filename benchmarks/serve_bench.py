@@ -0,0 +1,136 @@
+# ============================================
+# File: benchmarks/serve_bench.py
+# Description: Concurrency capacity of one gunicorn worker, sync vs gthread
+#
+# Starts `gunicorn -c gunicorn.conf.py app:app` with a single worker in each
+# serving mode (stub LLM/TTS, local PostgreSQL via PG_*), then fires bursts of
+# concurrent /ask requests and reports throughput and latency per burst size.
+# With upstream latency L, a sync worker tops out near 1/L req/s while a
+# gthread worker scales until its thread count.
+#
+# Usage: python benchmarks/serve_bench.py [--modes sync gthread] [--levels 1 10 50 100 200]
+# ============================================
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import threading
+import urllib.request
+import http.cookiejar
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+from load_bench import HttpClient, percentile
+
+
+def start_server(mode, port, threads, llm_latency_ms):
+    env = dict(
+        os.environ,
+        JARVIS_WORKER_MODE=mode,
+        WEB_CONCURRENCY="1",
+        GUNICORN_THREADS=str(threads),
+        PORT=str(port),
+        LLM_PROVIDER="stub",
+        TTS_PROVIDER="stub",
+        DMM_FASTPATH="off",
+        LLM_STUB_LATENCY_MS=str(llm_latency_ms),
+        BCRYPT_ROUNDS="4",
+        RATE_LIMIT_ENABLED="0",
+        FLASK_SECRET=os.environ.get("FLASK_SECRET", "bench-secret"),
+    )
+    proc = subprocess.Popen(
+        ["gunicorn", "-c", "gunicorn.conf.py", "app:app"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/get_active_user", timeout=1)
+            return proc
+        except Exception:
+            time.sleep(0.3)
+    proc.terminate()
+    raise RuntimeError(f"gunicorn ({mode}) did not start on port {port}")
+
+
+def burst(base_url, cookies, concurrency, requests_per_client):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def client():
+        c = HttpClient(base_url)
+        c.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(cookies))
+        for i in range(requests_per_client):
+            start = time.perf_counter()
+            status, _ = c.request("POST", "/ask", {"message": f"tell me something {i}"})
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies.append(elapsed)
+                if status >= 400:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors[0],
+        "rps": round(len(latencies) / wall, 2),
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--modes", nargs="+", default=["sync", "gthread"])
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 10, 50, 100, 200])
+    parser.add_argument("--requests-per-client", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=256)
+    parser.add_argument("--llm-latency-ms", type=float, default=500)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--output", default=os.path.join(ROOT, "benchmarks", "results", "serve_bench.json"))
+    args = parser.parse_args()
+
+    results = {}
+    for mode in args.modes:
+        proc = start_server(mode, args.port, args.threads, args.llm_latency_ms)
+        base_url = f"http://127.0.0.1:{args.port}"
+        try:
+            cookies = http.cookiejar.CookieJar()
+            login = HttpClient(base_url)
+            login.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(cookies))
+            username = f"serve_bench_{os.getpid()}"
+            login.request("POST", "/signup", {"email": f"{username}@example.com", "username": username, "password": "bench-password"})
+            login.request("POST", "/login", {"identifier": username, "password": "bench-password"})
+
+            results[mode] = []
+            print(f"\n== {mode} (1 worker) ==")
+            print(f"  {'conc':>5} {'reqs':>5} {'err':>4} {'rps':>8} {'p50':>9} {'p95':>9} {'p99':>9}")
+            for level in args.levels:
+                r = burst(base_url, cookies, level, args.requests_per_client)
+                results[mode].append(r)
+                print(f"  {r['concurrency']:>5} {r['requests']:>5} {r['errors']:>4} {r['rps']:>8.2f} "
+                      f"{r['p50_ms']:>7.1f}ms {r['p95_ms']:>7.1f}ms {r['p99_ms']:>7.1f}ms")
+        finally:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
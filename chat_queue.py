@@ -0,0 +1,157 @@
+# ============================================
+# File: chat_queue.py
+# Description: Write-behind queue that batches chat inserts off the request path
+# ============================================
+
+import os
+import time
+import queue
+import atexit
+import threading
+from datetime import datetime
+
+from jarvis_db import store_chats
+
+# === Load .env Variables ===
+# "async" -> fire-and-forget (reply is sent before the row is committed)
+# "ack"   -> enqueue_chat waits until the batch holding the row is committed
+CHAT_WRITE_MODE = os.environ.get("CHAT_WRITE_MODE", "async").lower()
+CHAT_BATCH_SIZE = int(os.environ.get("CHAT_BATCH_SIZE", "100"))
+CHAT_FLUSH_INTERVAL = float(os.environ.get("CHAT_FLUSH_INTERVAL", "0.5"))
+CHAT_QUEUE_MAX = int(os.environ.get("CHAT_QUEUE_MAX", "10000"))
+CHAT_ACK_TIMEOUT = float(os.environ.get("CHAT_ACK_TIMEOUT", "5"))
+CHAT_FLUSH_RETRIES = int(os.environ.get("CHAT_FLUSH_RETRIES", "3"))
+CHAT_RETRY_BACKOFF = float(os.environ.get("CHAT_RETRY_BACKOFF", "0.2"))
+
+
+class ChatWriter:
+    """Background thread that flushes queued chats in multi-row INSERTs."""
+
+    def __init__(self, batch_size=CHAT_BATCH_SIZE, flush_interval=CHAT_FLUSH_INTERVAL, maxsize=CHAT_QUEUE_MAX):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.stats = {
+            "enqueued": 0,
+            "flushed_rows": 0,
+            "flushes": 0,
+            "failed_rows": 0,
+            "retries": 0,
+            "splits": 0,
+            "flush_total_ms": 0.0,
+            "flush_max_ms": 0.0,
+        }
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="jarvis-chat-writer", daemon=True)
+                self._thread.start()
+
+    def enqueue(self, user_id, message, response, wait=False):
+        self.start()
+        ack = threading.Event() if wait else None
+        item = {"row": (user_id, message, response, datetime.now()), "ack": ack, "ok": False}
+        self._queue.put(item, timeout=CHAT_ACK_TIMEOUT)
+        with self._lock:
+            self.stats["enqueued"] += 1
+        if ack is None:
+            return True
+        return ack.wait(CHAT_ACK_TIMEOUT) and item["ok"]
+
+    def _run(self):
+        while not self._stop.is_set() or not self._queue.empty():
+            batch = self._collect()
+            if batch:
+                self._flush(batch)
+
+    def _collect(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, batch):
+        start = time.perf_counter()
+        failed = self._write(batch, attempts=CHAT_FLUSH_RETRIES)
+
+        elapsed = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.stats["flushes"] += 1
+            self.stats["flush_total_ms"] += elapsed
+            self.stats["flush_max_ms"] = max(self.stats["flush_max_ms"], elapsed)
+            self.stats["flushed_rows"] += len(batch) - len(failed)
+            self.stats["failed_rows"] += len(failed)
+
+        failed_ids = {id(item) for item in failed}
+        for item in batch:
+            item["ok"] = id(item) not in failed_ids
+            if item["ack"] is not None:
+                item["ack"].set()
+
+    def _write(self, batch, attempts=1):
+        """
+        Store `batch`, retrying with exponential backoff (transient errors such
+        as a restarting database). If it still fails, split it in halves (one
+        attempt each) so a single bad row only loses itself. Returns the items
+        that could not be stored.
+        """
+        rows = [item["row"] for item in batch]
+        for attempt in range(attempts):
+            try:
+                store_chats(rows)
+                return []
+            except Exception as e:
+                error = e
+                if attempt + 1 < attempts:
+                    with self._lock:
+                        self.stats["retries"] += 1
+                    time.sleep(CHAT_RETRY_BACKOFF * 2 ** attempt)
+
+        if len(batch) == 1:
+            print(f"❌ Failed to store chat for user {batch[0]['row'][0]}: {error}")
+            return batch
+        with self._lock:
+            self.stats["splits"] += 1
+        middle = len(batch) // 2
+        return self._write(batch[:middle]) + self._write(batch[middle:])
+
+    def close(self, timeout=10):
+        """Flush everything still queued and stop the writer thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def snapshot(self):
+        with self._lock:
+            data = dict(self.stats)
+        data["queue_depth"] = self._queue.qsize()
+        data["flush_avg_ms"] = data["flush_total_ms"] / data["flushes"] if data["flushes"] else 0.0
+        return data
+
+
+# === Process-wide Writer ===
+chat_writer = ChatWriter()
+atexit.register(chat_writer.close)
+
+
+def enqueue_chat(user_id, message, response, wait=None):
+    """Queue a chat row; waits for the commit when wait=True or CHAT_WRITE_MODE=ack."""
+    if wait is None:
+        wait = CHAT_WRITE_MODE == "ack"
+    try:
+        return chat_writer.enqueue(user_id, message, response, wait=wait)
+    except queue.Full:
+        print("❌ Chat queue is full; dropping chat row.")
+        return False
@@ -0,0 +1,226 @@
+# ============================================
+# File: db_pool.py
+# Description: Process-wide PostgreSQL connection pool shared by every DB call
+# ============================================
+
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extensions
+
+# === Load PostgreSQL Configuration from .env ===
+DB_CONFIG = {
+    "dbname": os.environ.get("PG_DB", "jarvis"),
+    "user": os.environ.get("PG_USER", "postgres"),
+    "password": os.environ.get("PG_PASS", ""),
+    "host": os.environ.get("PG_HOST", "localhost"),
+    "port": os.environ.get("PG_PORT", "5432")
+}
+
+# === Pool Tuning (sized per gunicorn worker) ===
+POOL_MIN = int(os.environ.get("PG_POOL_MIN", "1"))
+POOL_MAX = int(os.environ.get("PG_POOL_MAX", "10"))
+POOL_TIMEOUT = float(os.environ.get("PG_POOL_TIMEOUT", "5"))
+POOL_MAX_LIFETIME = float(os.environ.get("PG_POOL_MAX_LIFETIME", "1800"))
+POOL_HEALTHCHECK_IDLE = float(os.environ.get("PG_POOL_HEALTHCHECK_IDLE", "30"))
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """
+    Thread-safe psycopg2 pool with bounded waiting, health checks and recycling.
+
+    Up to `maxconn` connections stay open between requests (most recently
+    returned first), so concurrent requests reuse warm connections instead of
+    paying a TCP + auth handshake each.
+    """
+
+    def __init__(self, minconn=POOL_MIN, maxconn=POOL_MAX, timeout=POOL_TIMEOUT,
+                 max_lifetime=POOL_MAX_LIFETIME, healthcheck_idle=POOL_HEALTHCHECK_IDLE,
+                 **conn_kwargs):
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.healthcheck_idle = healthcheck_idle
+        self.conn_kwargs = conn_kwargs
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._idle = []     # (conn, born, last_used)
+        self._born = {}     # id(conn) -> born, for checked-out connections only
+        self._closed = False
+        self.stats = {
+            "checkouts": 0,
+            "timeouts": 0,
+            "opened": 0,
+            "recycled": 0,
+            "broken": 0,
+            "wait_total_ms": 0.0,
+            "wait_max_ms": 0.0,
+        }
+        now = time.monotonic()
+        for _ in range(min(minconn, maxconn)):
+            self._idle.append((self._connect(), now, now))
+
+    # === Checkout / Return ===
+    def getconn(self):
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self.stats["timeouts"] += 1
+            raise PoolTimeout(f"No PostgreSQL connection available within {self.timeout}s")
+
+        try:
+            conn = self._checkout_healthy()
+        except Exception:
+            self._slots.release()
+            raise
+
+        waited = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.stats["checkouts"] += 1
+            self.stats["wait_total_ms"] += waited
+            self.stats["wait_max_ms"] = max(self.stats["wait_max_ms"], waited)
+        return conn
+
+    def putconn(self, conn, close=False):
+        try:
+            with self._lock:
+                born = self._born.pop(id(conn), None)
+            if close or self._closed or born is None or conn.closed:
+                self._close(conn)
+                return
+            try:
+                if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                self._mark("broken")
+                self._close(conn)
+                return
+            with self._lock:
+                self._idle.append((conn, born, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    def _checkout_healthy(self):
+        while True:
+            with self._lock:
+                item = self._idle.pop() if self._idle else None
+
+            now = time.monotonic()
+            if item is None:
+                conn, born = self._connect(), now
+            else:
+                conn, born, last_used = item
+                if conn.closed:
+                    self._mark("broken")
+                    continue
+                if self.max_lifetime and now - born > self.max_lifetime:
+                    self._mark("recycled")
+                    self._close(conn)
+                    continue
+                if self.healthcheck_idle and now - last_used > self.healthcheck_idle and not self._ping(conn):
+                    self._mark("broken")
+                    self._close(conn)
+                    continue
+
+            with self._lock:
+                self._born[id(conn)] = born
+            return conn
+
+    def _connect(self):
+        conn = psycopg2.connect(**self.conn_kwargs)
+        self._mark("opened")
+        return conn
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _ping(self, conn):
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _mark(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def snapshot(self):
+        with self._lock:
+            data = dict(self.stats)
+            data["in_use"] = len(self._born)
+            data["idle"] = len(self._idle)
+        data["max"] = self.maxconn
+        data["wait_avg_ms"] = data["wait_total_ms"] / data["checkouts"] if data["checkouts"] else 0.0
+        return data
+
+    def closeall(self):
+        # Checked-out connections are closed as they are returned
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn, _, _ in idle:
+            self._close(conn)
+
+
+# ============================================
+# Process-wide Pool (re-created after gunicorn fork)
+# ============================================
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool_pid != pid:
+                _pool = ConnectionPool(**DB_CONFIG)
+                _pool_pid = pid
+    return _pool
+
+
+@contextmanager
+def db_connection():
+    """Borrow a pooled connection; commits on success, rolls back on error."""
+    pool = get_pool()
+    conn = pool.getconn()
+    broken = False
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        try:
+            conn.rollback()
+        except Exception:
+            broken = True
+        raise
+    finally:
+        pool.putconn(conn, close=broken)
+
+
+def pool_stats():
+    return get_pool().snapshot() if _pool is not None else {}
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
@@ -0,0 +1,44 @@
+# ============================================
+# File: gunicorn.conf.py
+# Description: Gunicorn serving modes for the I/O-bound request path
+#
+#   JARVIS_WORKER_MODE=gthread (default)  each worker holds GUNICORN_THREADS
+#                                         in-flight requests while they wait on
+#                                         Groq/Cohere/Google/edge-tts/Postgres
+#   JARVIS_WORKER_MODE=sync               one request per worker (old behaviour)
+#
+# Usage: gunicorn -c gunicorn.conf.py app:app
+# Capacity comparison: python benchmarks/serve_bench.py
+# ============================================
+
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+mode = os.environ.get("JARVIS_WORKER_MODE", "gthread").lower()
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+
+if mode == "gthread":
+    worker_class = "gthread"
+    threads = int(os.environ.get("GUNICORN_THREADS", "128"))
+else:
+    worker_class = "sync"
+    threads = 1
+
+# Streaming responses (/ask/stream, /speak/stream) can stay open for a while
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+
+# Per-worker resource sizing follows the thread count unless set explicitly:
+# DB work is short, so a pool far smaller than the thread count is enough.
+os.environ.setdefault("PG_POOL_MAX", str(min(max(threads // 4, 5), 32)))
+os.environ.setdefault("TASK_WORKERS", str(min(max(threads // 2, 8), 64)))
+
+
+def worker_exit(server, worker):
+    # Flush queued chat rows before the worker goes away
+    try:
+        from chat_queue import chat_writer
+        chat_writer.close()
+    except Exception as e:
+        print(f"⚠️ Chat queue flush on exit failed: {e}")
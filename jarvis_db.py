@@ -1,332 +1,846 @@
-import psycopg2
 import uuid
+import html
+import zlib
+import hashlib
 from datetime import datetime
 import os
 from dotenv import dotenv_values
+from psycopg2 import Binary
+from psycopg2.extras import execute_values
+from Backend.cache import TTLCache
+from Backend.metrics import timed
 
-# === Load PostgreSQL Configuration from .env ===
-
-
-DB_CONFIG = {
-    "dbname": os.environ.get("PG_DB", "jarvis"),
-    "user": os.environ.get("PG_USER", "postgres"),
-    "password": os.environ.get("PG_PASS", ""),
-    "host": os.environ.get("PG_HOST", "localhost"),
-    "port": os.environ.get("PG_PORT", "5432")
-}
-
-def get_conn():
-    return psycopg2.connect(**DB_CONFIG)
+# === Pooled PostgreSQL Connections (see db_pool.py) ===
+from db_pool import db_connection
 
 # === Initialize Database Tables ===
+@timed("db.init_db")
 def init_db():
-    conn = cursor = None
     try:
-        conn = get_conn()
-        cursor = conn.cursor()
+        with db_connection() as conn, conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT table_name FROM information_schema.tables 
+                WHERE table_schema='public'
+            """)
+            existing_tables = {row[0] for row in cursor.fetchall()}
+            required_tables = {"users", "sessions", "chats", "otp_reset", "user_files"}
 
-        cursor.execute("""
-            SELECT table_name FROM information_schema.tables 
-            WHERE table_schema='public'
-        """)
-        existing_tables = {row[0] for row in cursor.fetchall()}
-        required_tables = {"users", "sessions", "chats", "otp_reset", "user_files"}
-
-        if required_tables.issubset(existing_tables):
-            print("⚠️ Tables already exist. Skipping creation.")
-            return
+            if required_tables.issubset(existing_tables):
+                print("⚠️ Tables already exist. Skipping creation.")
+                upgrade_columns(cursor)
+                create_indexes(cursor)
+                return
 
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id TEXT PRIMARY KEY,
-                username TEXT UNIQUE NOT NULL,
-                password TEXT NOT NULL,
-                email TEXT UNIQUE NOT NULL CHECK (email ~* '^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\\.[A-Za-z]{2,}$'),
-                created_at TIMESTAMP NOT NULL,
-                is_admin BOOLEAN DEFAULT FALSE
-            )
-        """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS users (
+                    id TEXT PRIMARY KEY,
+                    username TEXT UNIQUE NOT NULL,
+                    password TEXT NOT NULL,
+                    email TEXT UNIQUE NOT NULL CHECK (email ~* '^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\\.[A-Za-z]{2,}$'),
+                    created_at TIMESTAMP NOT NULL,
+                    is_admin BOOLEAN DEFAULT FALSE,
+                    semantic_cache BOOLEAN NOT NULL DEFAULT TRUE
+                )
+            """)
 
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS sessions (
-                session_id SERIAL PRIMARY KEY,
-                user_id TEXT NOT NULL,
-                username TEXT UNIQUE NOT NULL,
-                logged_in INTEGER DEFAULT 0,
-                last_login TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id),
-                FOREIGN KEY (username) REFERENCES users(username)
-            )
-        """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id SERIAL PRIMARY KEY,
+                    user_id TEXT NOT NULL,
+                    username TEXT UNIQUE NOT NULL,
+                    logged_in INTEGER DEFAULT 0,
+                    last_login TIMESTAMP,
+                    FOREIGN KEY (user_id) REFERENCES users(id),
+                    FOREIGN KEY (username) REFERENCES users(username)
+                )
+            """)
 
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS chats (
-                id SERIAL PRIMARY KEY,
-                user_id TEXT NOT NULL,
-                username TEXT NOT NULL,
-                message TEXT NOT NULL,
-                response TEXT NOT NULL,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id),
-                FOREIGN KEY (username) REFERENCES users(username)
-            )
-        """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS chats (
+                    id SERIAL PRIMARY KEY,
+                    user_id TEXT NOT NULL,
+                    message TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    search_vector TSVECTOR,
+                    FOREIGN KEY (user_id) REFERENCES users(id)
+                )
+            """)
+            for statement in SEARCH_SETUP_STATEMENTS:
+                cursor.execute(statement.format(concurrently=""))
 
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS otp_reset (
-                username TEXT PRIMARY KEY,
-                otp TEXT,
-                created_at TIMESTAMP
-            )
-        """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS otp_reset (
+                    username TEXT PRIMARY KEY,
+                    otp TEXT,
+                    created_at TIMESTAMP
+                )
+            """)
 
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS user_files (
-                id SERIAL PRIMARY KEY,
-                user_id TEXT NOT NULL,
-                filename TEXT NOT NULL,
-                content TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id)
-            )
-        """)
-
-        conn.commit()
-        print("✅ PostgreSQL database initialized.")
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS user_files (
+                    id SERIAL PRIMARY KEY,
+                    user_id TEXT NOT NULL,
+                    filename TEXT NOT NULL,
+                    content TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (user_id) REFERENCES users(id)
+                )
+            """)
+            upgrade_columns(cursor)
+            create_indexes(cursor)
+            print("✅ PostgreSQL database initialized.")
     except Exception as e:
         print(f"❌ Error initializing DB: {e}")
-    finally:
-        if cursor: cursor.close()
-        if conn: conn.close()
+
+# === Columns added after the initial schema (metadata-only, idempotent) ===
+def upgrade_columns(cursor):
+    cursor.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS semantic_cache BOOLEAN NOT NULL DEFAULT TRUE")
+
+    # store_chats no longer writes chats.username: relax it on startup (catalog-only
+    # changes). The index build and user_id backfill stay in `migrate`.
+    cursor.execute("""
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'chats' AND column_name = 'username'
+    """)
+    if cursor.fetchone() is not None:
+        cursor.execute("ALTER TABLE chats ALTER COLUMN username DROP NOT NULL")
+        cursor.execute("ALTER TABLE chats DROP CONSTRAINT IF EXISTS chats_username_fkey")
+
+    # Content-addressed file storage: user_files rows point at shared, compressed,
+    # refcounted blobs. Legacy rows keep their TEXT content until `migrate-files`.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS file_blobs (
+            hash TEXT PRIMARY KEY,
+            data BYTEA NOT NULL,
+            size BIGINT NOT NULL,
+            stored_size BIGINT NOT NULL,
+            refcount INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_referenced TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    # Already zlib-compressed: skip TOAST compression so substring() reads only the chunks it needs
+    cursor.execute("ALTER TABLE file_blobs ALTER COLUMN data SET STORAGE EXTERNAL")
+    cursor.execute("ALTER TABLE user_files ADD COLUMN IF NOT EXISTS blob_hash TEXT REFERENCES file_blobs(hash)")
+    cursor.execute("ALTER TABLE user_files ALTER COLUMN content DROP NOT NULL")
+
+# === Indexes (idempotent, also applied to existing databases) ===
+# Large existing databases should run `python jarvis_db.py migrate` first so
+# these are built CONCURRENTLY; afterwards they are no-ops.
+def create_indexes(cursor):
+    for statement in INDEX_STATEMENTS:
+        cursor.execute(statement.format(concurrently=""))
+
+INDEX_STATEMENTS = [
+    """
+    CREATE INDEX {concurrently} IF NOT EXISTS idx_chats_user_timestamp
+    ON chats (user_id, timestamp DESC, id DESC)
+    """,
+    """
+    CREATE INDEX {concurrently} IF NOT EXISTS idx_sessions_user_id
+    ON sessions (user_id)
+    """,
+    """
+    CREATE INDEX {concurrently} IF NOT EXISTS idx_users_email_lower
+    ON users (lower(email))
+    """,
+    """
+    CREATE INDEX {concurrently} IF NOT EXISTS idx_user_files_user_filename
+    ON user_files (user_id, filename, id DESC)
+    """,
+    """
+    CREATE INDEX {concurrently} IF NOT EXISTS idx_user_files_user_created
+    ON user_files (user_id, created_at DESC, id DESC)
+    """,
+]
+
+# === Full-text Search over chats (trigger-maintained tsvector + GIN) ===
+# Message terms weigh more than response terms. A trigger rather than a
+# generated column lets existing tables be converted online (see
+# migrate_chat_search) instead of rewriting them under an exclusive lock.
+SEARCH_SETUP_STATEMENTS = [
+    """
+    CREATE OR REPLACE FUNCTION chats_search_vector() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('english', coalesce(NEW.message, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(NEW.response, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    DROP TRIGGER IF EXISTS trg_chats_search_vector ON chats
+    """,
+    """
+    CREATE TRIGGER trg_chats_search_vector
+    BEFORE INSERT OR UPDATE OF message, response ON chats
+    FOR EACH ROW EXECUTE FUNCTION chats_search_vector()
+    """,
+    """
+    CREATE INDEX {concurrently} IF NOT EXISTS idx_chats_search
+    ON chats USING GIN (search_vector)
+    """,
+]
+
+def migrate_chat_search(batch_size=5000):
+    """
+    Online conversion of an existing chats table:
+      1. add the nullable search_vector column (metadata only) and the trigger
+      2. backfill existing rows in small batches
+      3. build the GIN index CONCURRENTLY
+    Safe to re-run.
+    """
+    with db_connection() as conn:
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("ALTER TABLE chats ADD COLUMN IF NOT EXISTS search_vector TSVECTOR")
+                for statement in SEARCH_SETUP_STATEMENTS[:3]:
+                    cursor.execute(statement)
+                print("✅ search_vector column and trigger ready.")
+
+                total = 0
+                while True:
+                    cursor.execute("""
+                        UPDATE chats SET message = message
+                        WHERE id IN (SELECT id FROM chats WHERE search_vector IS NULL LIMIT %s)
+                    """, (batch_size,))
+                    total += cursor.rowcount
+                    if cursor.rowcount < batch_size:
+                        break
+                print(f"✅ Backfilled search_vector on {total} chats.")
+
+                cursor.execute(SEARCH_SETUP_STATEMENTS[3].format(concurrently="CONCURRENTLY"))
+                print("✅ GIN index ready.")
+        finally:
+            conn.autocommit = False
+
+# ============================================
+# Migration: key chats by user_id instead of username
+# ============================================
+
+def migrate_user_id_keys(drop_username=False, batch_size=5000):
+    """
+    Online migration for databases created before chats were keyed by user_id:
+      1. build the user_id indexes CONCURRENTLY (no table lock)
+      2. backfill chats.user_id from users by username, in small batches
+      3. relax chats.username (NOT NULL + FK) so new rows can omit it
+         (init_db also does this on startup)
+      4. drop the old username index, and optionally the column itself
+    Safe to re-run; every step is idempotent.
+    """
+    with db_connection() as conn:
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cursor:
+                for statement in INDEX_STATEMENTS:
+                    cursor.execute(statement.format(concurrently="CONCURRENTLY"))
+                print("✅ user_id indexes ready.")
+
+                cursor.execute("""
+                    SELECT 1 FROM information_schema.columns
+                    WHERE table_name = 'chats' AND column_name = 'username'
+                """)
+                if cursor.fetchone() is None:
+                    print("⚠️ chats.username already dropped. Nothing to backfill.")
+                    return
+
+                total = 0
+                while True:
+                    cursor.execute("""
+                        UPDATE chats c SET user_id = u.id
+                        FROM users u
+                        WHERE c.id IN (
+                            SELECT c2.id FROM chats c2 JOIN users u2 ON u2.username = c2.username
+                            WHERE c2.user_id IS DISTINCT FROM u2.id LIMIT %s
+                        ) AND u.username = c.username
+                    """, (batch_size,))
+                    total += cursor.rowcount
+                    if cursor.rowcount < batch_size:
+                        break
+                print(f"✅ Backfilled user_id on {total} chats.")
+
+                cursor.execute("ALTER TABLE chats ALTER COLUMN username DROP NOT NULL")
+                cursor.execute("ALTER TABLE chats DROP CONSTRAINT IF EXISTS chats_username_fkey")
+                cursor.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_chats_username_timestamp")
+                if drop_username:
+                    cursor.execute("ALTER TABLE chats DROP COLUMN IF EXISTS username")
+                    print("✅ Dropped chats.username.")
+        finally:
+            conn.autocommit = False
 
 # === Insert New User ===
+@timed("db.insert_user")
 def insert_user(username, password, email=None, is_admin=False):
-    conn = cursor = None
     try:
-        conn = get_conn()
-        cursor = conn.cursor()
-        user_id = str(uuid.uuid4())
-        now = datetime.now()
+        with db_connection() as conn, conn.cursor() as cursor:
+            user_id = str(uuid.uuid4())
+            now = datetime.now()
 
-        cursor.execute("""
-            INSERT INTO users (id, username, password, email, created_at, is_admin)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """, (user_id, username, password, email, now, is_admin))
+            cursor.execute("""
+                INSERT INTO users (id, username, password, email, created_at, is_admin)
+                VALUES (%s, %s, %s, %s, %s, %s)
+            """, (user_id, username, password, email, now, is_admin))
 
-        cursor.execute("""
-            INSERT INTO sessions (user_id, username, logged_in, last_login)
-            VALUES (%s, %s, %s, %s)
-        """, (user_id, username, 0, None))
-
-        conn.commit()
-        print(f"✅ User '{username}' inserted.")
+            cursor.execute("""
+                INSERT INTO sessions (user_id, username, logged_in, last_login)
+                VALUES (%s, %s, %s, %s)
+            """, (user_id, username, 0, None))
+            invalidate_user(username)
+            print(f"✅ User '{username}' inserted.")
     except Exception as e:
         print(f"❌ Failed to insert user: {e}")
-    finally:
-        if cursor: cursor.close()
-        if conn: conn.close()
 
 # === Store Chat ===
-def store_chat(user_id, username, message, response):
-    conn = cursor = None
+@timed("db.store_chat")
+def store_chat(user_id, message, response):
     try:
-        conn = get_conn()
-        cursor = conn.cursor()
-        now = datetime.now()
-        cursor.execute("""
-            INSERT INTO chats (user_id, username, message, response, timestamp)
-            VALUES (%s, %s, %s, %s, %s)
-        """, (user_id, username, message, response, now))
-        conn.commit()
+        with db_connection() as conn, conn.cursor() as cursor:
+            now = datetime.now()
+            cursor.execute("""
+                INSERT INTO chats (user_id, message, response, timestamp)
+                VALUES (%s, %s, %s, %s)
+            """, (user_id, message, response, now))
     except Exception as e:
         print(f"❌ Failed to store chat: {e}")
-    finally:
-        if cursor: cursor.close()
-        if conn: conn.close()
+
+# === Store Chats in Bulk (used by chat_queue) ===
+# rows: (user_id, message, response, timestamp)
+@timed("db.store_chats")
+def store_chats(rows):
+    if not rows:
+        return 0
+    with db_connection() as conn, conn.cursor() as cursor:
+        # Rows for users deleted since they were queued are skipped, not allowed
+        # to fail the whole batch on chats_user_id_fkey
+        execute_values(cursor, """
+            INSERT INTO chats (user_id, message, response, timestamp)
+            SELECT v.user_id, v.message, v.response, v.ts
+            FROM (VALUES %s) AS v (user_id, message, response, ts)
+            JOIN users u ON u.id = v.user_id
+        """, rows, template="(%s, %s, %s, %s::timestamp)", page_size=500)
+        return cursor.rowcount
 
 # === Fetch Chat History ===
-def get_chat_history(username):
-    conn = cursor = None
+@timed("db.get_chat_history")
+def get_chat_history(user_id):
     try:
-        conn = get_conn()
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT message, response, timestamp FROM chats
-            WHERE username = %s ORDER BY timestamp ASC
-        """, (username,))
-        return [{"message": row[0], "response": row[1], "timestamp": row[2]} for row in cursor.fetchall()]
+        with db_connection() as conn, conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT message, response, timestamp FROM chats
+                WHERE user_id = %s ORDER BY timestamp ASC, id ASC
+            """, (user_id,))
+            return [{"message": row[0], "response": row[1], "timestamp": row[2]} for row in cursor.fetchall()]
     except Exception as e:
         print(f"❌ Error fetching chat history: {e}")
         return []
-    finally:
-        if cursor: cursor.close()
-        if conn: conn.close()
+
+# === Fetch Chat History (keyset-paginated, newest page first) ===
+HISTORY_PAGE_SIZE = 50
+HISTORY_PAGE_MAX = 200
+
+def encode_history_cursor(timestamp, chat_id):
+    return f"{timestamp.isoformat()}|{chat_id}"
+
+def decode_history_cursor(cursor_value):
+    try:
+        ts, chat_id = cursor_value.rsplit("|", 1)
+        return datetime.fromisoformat(ts), int(chat_id)
+    except (AttributeError, ValueError):
+        return None
+
+@timed("db.get_chat_page")
+def get_chat_page(user_id, before=None, limit=HISTORY_PAGE_SIZE):
+    """Return ({messages oldest->newest}, next_cursor) for the page older than `before`."""
+    limit = max(1, min(int(limit), HISTORY_PAGE_MAX))
+    position = decode_history_cursor(before) if before else None
+    try:
+        with db_connection() as conn, conn.cursor() as cursor:
+            if position:
+                cursor.execute("""
+                    SELECT id, message, response, timestamp FROM chats
+                    WHERE user_id = %s AND (timestamp, id) < (%s, %s)
+                    ORDER BY timestamp DESC, id DESC LIMIT %s
+                """, (user_id, position[0], position[1], limit + 1))
+            else:
+                cursor.execute("""
+                    SELECT id, message, response, timestamp FROM chats
+                    WHERE user_id = %s
+                    ORDER BY timestamp DESC, id DESC LIMIT %s
+                """, (user_id, limit + 1))
+            rows = cursor.fetchall()
+    except Exception as e:
+        print(f"❌ Error fetching chat page: {e}")
+        return [], None
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_history_cursor(rows[-1][3], rows[-1][0]) if has_more else None
+    messages = [{"message": row[1], "response": row[2], "timestamp": row[3]} for row in reversed(rows)]
+    return messages, next_cursor
+
+# === Newest Chat Time (conversation memory freshness check, index-only LIMIT 1) ===
+@timed("db.get_latest_chat_time")
+def get_latest_chat_time(user_id):
+    try:
+        with db_connection() as conn, conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT timestamp FROM chats WHERE user_id = %s
+                ORDER BY timestamp DESC, id DESC LIMIT 1
+            """, (user_id,))
+            row = cursor.fetchone()
+            return row[0] if row else None
+    except Exception as e:
+        print(f"❌ Error fetching latest chat time: {e}")
+        return None
+
+# === Search Chat History (ranked, highlighted, keyset-paginated) ===
+SEARCH_PAGE_SIZE = 20
+SEARCH_PAGE_MAX = 100
+# Control characters as highlight markers so the text can be HTML-escaped afterwards
+HEADLINE_OPTIONS = "StartSel=\x02, StopSel=\x03, MaxWords=35, MinWords=15, MaxFragments=2, FragmentDelimiter=\" … \""
+
+def highlight(text):
+    return html.escape(text or "").replace("\x02", "<mark>").replace("\x03", "</mark>")
+
+def encode_search_cursor(rank, chat_id):
+    return f"{rank!r}|{chat_id}"
+
+def decode_search_cursor(cursor_value):
+    try:
+        rank, chat_id = cursor_value.rsplit("|", 1)
+        return float(rank), int(chat_id)
+    except (AttributeError, ValueError):
+        return None
+
+@timed("db.search_chats")
+def search_chats(user_id, query, after=None, limit=SEARCH_PAGE_SIZE):
+    """Return ([hits best-first], next_cursor) for a websearch-style `query`."""
+    limit = max(1, min(int(limit), SEARCH_PAGE_MAX))
+    position = decode_search_cursor(after) if after else None
+    try:
+        with db_connection() as conn, conn.cursor() as cursor:
+            # Rank every match, page by (rank, id), then build headlines for the page only
+            cursor.execute("""
+                WITH q AS (SELECT websearch_to_tsquery('english', %(query)s) AS query),
+                page AS (
+                    SELECT c.id, c.message, c.response, c.timestamp,
+                           ts_rank_cd(c.search_vector, q.query)::float8 AS rank
+                    FROM chats c, q
+                    WHERE c.user_id = %(user_id)s AND c.search_vector @@ q.query
+                )
+                SELECT page.id, page.timestamp, page.rank,
+                       ts_headline('english', page.message, q.query, %(options)s),
+                       ts_headline('english', page.response, q.query, %(options)s)
+                FROM page, q
+                WHERE %(rank)s::float8 IS NULL OR (page.rank, page.id) < (%(rank)s::float8, %(id)s)
+                ORDER BY page.rank DESC, page.id DESC
+                LIMIT %(limit)s
+            """, {
+                "query": query,
+                "user_id": user_id,
+                "options": HEADLINE_OPTIONS,
+                "rank": position[0] if position else None,
+                "id": position[1] if position else None,
+                "limit": limit + 1,
+            })
+            rows = cursor.fetchall()
+    except Exception as e:
+        print(f"❌ Error searching chats: {e}")
+        return [], None
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_search_cursor(rows[-1][2], rows[-1][0]) if has_more else None
+    hits = [{
+        "id": row[0],
+        "timestamp": row[1],
+        "rank": row[2],
+        "message": highlight(row[3]),
+        "response": highlight(row[4]),
+    } for row in rows]
+    return hits, next_cursor
 
 # === Session Updates ===
-def update_session_login(username):
-    conn = cursor = None
+# Single upsert used by both auth_manager and app.py for session bookkeeping
+@timed("db.update_session_login")
+def update_session_login(username, user_id=None):
     try:
-        conn = get_conn()
-        cursor = conn.cursor()
-        cursor.execute("""
-            UPDATE sessions SET logged_in = 1, last_login = %s
-            WHERE username = %s
-        """, (datetime.now(), username))
-        conn.commit()
+        with db_connection() as conn, conn.cursor() as cursor:
+            if user_id:
+                cursor.execute("""
+                    INSERT INTO sessions (user_id, username, logged_in, last_login)
+                    VALUES (%s, %s, 1, %s)
+                    ON CONFLICT (username) DO UPDATE SET logged_in = 1, last_login = EXCLUDED.last_login
+                """, (user_id, username, datetime.now()))
+            else:
+                cursor.execute("""
+                    UPDATE sessions SET logged_in = 1, last_login = %s
+                    WHERE username = %s
+                """, (datetime.now(), username))
     except Exception as e:
         print(f"❌ Login session update failed: {e}")
-    finally:
-        if cursor: cursor.close()
-        if conn: conn.close()
 
+@timed("db.update_session_logout")
 def update_session_logout(username):
-    conn = cursor = None
     try:
-        conn = get_conn()
-        cursor = conn.cursor()
-        cursor.execute("UPDATE sessions SET logged_in = 0 WHERE username = %s", (username,))
-        conn.commit()
+        with db_connection() as conn, conn.cursor() as cursor:
+            cursor.execute("UPDATE sessions SET logged_in = 0 WHERE username = %s", (username,))
     except Exception as e:
         print(f"❌ Logout session update failed: {e}")
-    finally:
-        if cursor: cursor.close()
-        if conn: conn.close()
 
+@timed("db.get_logged_in_users")
 def get_logged_in_users():
-    conn = cursor = None
     try:
-        conn = get_conn()
-        cursor = conn.cursor()
-        cursor.execute("SELECT username FROM sessions WHERE logged_in = 1")
-        return [row[0] for row in cursor.fetchall()]
+        with db_connection() as conn, conn.cursor() as cursor:
+            cursor.execute("SELECT username FROM sessions WHERE logged_in = 1")
+            return [row[0] for row in cursor.fetchall()]
     except Exception as e:
         print(f"❌ Error fetching logged-in users: {e}")
         return []
-    finally:
-        if cursor: cursor.close()
-        if conn: conn.close()
 
+@timed("db.get_session_info")
 def get_session_info(username):
-    conn = cursor = None
     try:
-        conn = get_conn()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM sessions WHERE username = %s", (username,))
-        return cursor.fetchone()
+        with db_connection() as conn, conn.cursor() as cursor:
+            cursor.execute("SELECT * FROM sessions WHERE username = %s", (username,))
+            return cursor.fetchone()
     except Exception as e:
         print(f"❌ Error fetching session info: {e}")
         return None
-    finally:
-        if cursor: cursor.close()
-        if conn: conn.close()
 
+@timed("db.get_user_by_name")
 def get_user_by_name(username):
-    conn = cursor = None
     try:
-        conn = get_conn()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM users WHERE username = %s", (username,))
+        with db_connection() as conn, conn.cursor() as cursor:
+            cursor.execute("SELECT * FROM users WHERE username = %s", (username,))
+            row = cursor.fetchone()
+            if row:
+                return {
+                    "id": row[0],
+                    "username": row[1],
+                    "password": row[2],
+                    "email": row[3],
+                    "created_at": row[4],
+                    "is_admin": row[5]
+                }
+            return None
+    except Exception as e:
+        print(f"❌ Error fetching user: {e}")
+        return None
+
+# === Login Lookup (username or case-insensitive email, one round trip) ===
+# Also primes the identity cache so the route's session setup needs no query.
+@timed("db.find_login_user")
+def find_login_user(identifier):
+    with db_connection() as conn, conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT id, username, password, email, is_admin, semantic_cache FROM users
+            WHERE username = %s OR lower(email) = lower(%s)
+            ORDER BY (username = %s) DESC
+            LIMIT 1
+        """, (identifier, identifier, identifier))
         row = cursor.fetchone()
-        if row:
-            return {
-                "id": row[0],
-                "username": row[1],
-                "password": row[2],
-                "email": row[3],
-                "created_at": row[4],
-                "is_admin": row[5]
-            }
+    if not row:
         return None
+    user_cache.set(row[1], {"id": row[0], "username": row[1], "email": row[3], "is_admin": row[4], "semantic_cache": row[5]})
+    return row[0], row[1], row[2]
+
+# === Cached User Identity (id, email, is_admin, preferences; no password hash) ===
+USER_CACHE_TTL = int(os.environ.get("USER_CACHE_TTL", "300"))
+USER_CACHE_SIZE = int(os.environ.get("USER_CACHE_SIZE", "10000"))
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL, name="user")
+
+@timed("db.get_user_identity")
+def get_user_identity(username):
+    if not username:
+        return None
+    identity = user_cache.get(username)
+    if identity is not None:
+        return identity
+    try:
+        with db_connection() as conn, conn.cursor() as cursor:
+            cursor.execute("SELECT id, username, email, is_admin, semantic_cache FROM users WHERE username = %s", (username,))
+            row = cursor.fetchone()
     except Exception as e:
-        print(f"❌ Error fetching user: {e}")
+        print(f"❌ Error fetching user identity: {e}")
         return None
+    if not row:
+        return None
+    identity = {"id": row[0], "username": row[1], "email": row[2], "is_admin": row[3], "semantic_cache": row[4]}
+    user_cache.set(username, identity)
+    return identity
+
+def invalidate_user(username):
+    user_cache.delete(username)
+
+# === Per-user Semantic Cache Opt-out ===
+@timed("db.set_semantic_cache")
+def set_semantic_cache(username, enabled):
+    try:
+        with db_connection() as conn, conn.cursor() as cursor:
+            cursor.execute("UPDATE users SET semantic_cache = %s WHERE username = %s", (bool(enabled), username))
+            return cursor.rowcount > 0
+    except Exception as e:
+        print(f"❌ Error updating semantic cache preference: {e}")
+        return False
     finally:
-        if cursor: cursor.close()
-        if conn: conn.close()
+        invalidate_user(username)
 
 # === Admin Panel: View All Users ===
+@timed("db.get_all_users")
 def get_all_users():
-    conn = cursor = None
     try:
-        conn = get_conn()
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, username, email, created_at, is_admin FROM users ORDER BY created_at DESC")
-        return cursor.fetchall()
+        with db_connection() as conn, conn.cursor() as cursor:
+            cursor.execute("SELECT id, username, email, created_at, is_admin FROM users ORDER BY created_at DESC")
+            return cursor.fetchall()
     except Exception as e:
         print(f"❌ Error fetching users: {e}")
         return []
-    finally:
-        if cursor: cursor.close()
-        if conn: conn.close()
 
 # === Admin Panel: Delete User ===
+@timed("db.delete_user")
 def delete_user(username):
-    conn = cursor = None
     try:
-        conn = get_conn()
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM chats WHERE username = %s", (username,))
-        cursor.execute("DELETE FROM otp_reset WHERE username = %s", (username,))
-        cursor.execute("DELETE FROM sessions WHERE username = %s", (username,))
-        cursor.execute("DELETE FROM users WHERE username = %s", (username,))
-        conn.commit()
-        return True
+        with db_connection() as conn, conn.cursor() as cursor:
+            cursor.execute("SELECT id FROM users WHERE username = %s", (username,))
+            row = cursor.fetchone()
+            if not row:
+                return False
+            user_id = row[0]
+            cursor.execute("DELETE FROM chats WHERE user_id = %s", (user_id,))
+            delete_files_where(cursor, "user_id = %s", (user_id,))
+            cursor.execute("DELETE FROM otp_reset WHERE username = %s", (username,))
+            cursor.execute("DELETE FROM sessions WHERE user_id = %s", (user_id,))
+            cursor.execute("DELETE FROM users WHERE id = %s", (user_id,))
+            return True
     except Exception as e:
         print(f"❌ Error deleting user: {e}")
         return False
     finally:
-        if cursor: cursor.close()
-        if conn: conn.close()
+        invalidate_user(username)
 
-# === File Management ===
+# === File Management (content-addressed, compressed blobs) ===
+FILE_COMPRESSION_LEVEL = int(os.environ.get("FILE_COMPRESSION_LEVEL", "6"))
+FILE_CHUNK_SIZE = int(os.environ.get("FILE_CHUNK_SIZE", str(64 * 1024)))
+FILE_RETENTION_DAYS = int(os.environ.get("FILE_RETENTION_DAYS", "0"))   # 0 keeps files forever
+FILE_GC_GRACE_HOURS = int(os.environ.get("FILE_GC_GRACE_HOURS", "1"))
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+def store_blob(cursor, data):
+    """Reference (or create) the blob for `data` and return its hash."""
+    digest = content_hash(data)
+    cursor.execute("""
+        UPDATE file_blobs SET refcount = refcount + 1, last_referenced = now()
+        WHERE hash = %s
+    """, (digest,))
+    if cursor.rowcount == 0:
+        compressed = zlib.compress(data, FILE_COMPRESSION_LEVEL)
+        cursor.execute("""
+            INSERT INTO file_blobs (hash, data, size, stored_size, refcount)
+            VALUES (%s, %s, %s, %s, 1)
+            ON CONFLICT (hash) DO UPDATE
+            SET refcount = file_blobs.refcount + 1, last_referenced = now()
+        """, (digest, Binary(compressed), len(data), len(compressed)))
+    return digest
+
+def delete_files_where(cursor, condition, params):
+    """Delete user_files rows matching `condition` and release their blob references."""
+    cursor.execute(f"""
+        WITH removed AS (
+            DELETE FROM user_files WHERE {condition} RETURNING blob_hash
+        )
+        UPDATE file_blobs b SET refcount = b.refcount - r.n
+        FROM (
+            SELECT blob_hash, count(*) AS n FROM removed
+            WHERE blob_hash IS NOT NULL GROUP BY blob_hash
+        ) r
+        WHERE b.hash = r.blob_hash
+    """, params)
+
+@timed("db.save_user_file")
 def save_user_file(user_id, filename, content):
-    conn = cursor = None
     try:
-        conn = get_conn()
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO user_files (user_id, filename, content)
-            VALUES (%s, %s, %s)
-        """, (user_id, filename, content))
-        conn.commit()
+        with db_connection() as conn, conn.cursor() as cursor:
+            digest = store_blob(cursor, content.encode("utf-8"))
+            cursor.execute("""
+                INSERT INTO user_files (user_id, filename, blob_hash)
+                VALUES (%s, %s, %s)
+            """, (user_id, filename, digest))
     except Exception as e:
         print(f"❌ Failed to save user file: {e}")
-    finally:
-        if cursor: cursor.close()
-        if conn: conn.close()
 
-def get_user_files(user_id):
-    conn = cursor = None
+# === List Files (keyset-paginated, newest first; cursor format as history) ===
+FILES_PAGE_SIZE = 50
+FILES_PAGE_MAX = 200
+
+@timed("db.get_user_files")
+def get_user_files(user_id, before=None, limit=FILES_PAGE_SIZE):
+    """Return ([{filename, size, created_at}] newest first, next_cursor)."""
+    limit = max(1, min(int(limit), FILES_PAGE_MAX))
+    position = decode_history_cursor(before) if before else None
     try:
-        conn = get_conn()
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT filename, created_at FROM user_files
-            WHERE user_id = %s ORDER BY created_at DESC
-        """, (user_id,))
-        return cursor.fetchall()
+        with db_connection() as conn, conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT f.id, f.filename, f.created_at, COALESCE(b.size, octet_length(f.content))
+                FROM user_files f LEFT JOIN file_blobs b ON b.hash = f.blob_hash
+                WHERE f.user_id = %(user_id)s
+                  AND (%(ts)s::timestamp IS NULL OR (f.created_at, f.id) < (%(ts)s::timestamp, %(id)s))
+                ORDER BY f.created_at DESC, f.id DESC
+                LIMIT %(limit)s
+            """, {
+                "user_id": user_id,
+                "ts": position[0] if position else None,
+                "id": position[1] if position else None,
+                "limit": limit + 1,
+            })
+            rows = cursor.fetchall()
     except Exception as e:
         print(f"❌ Failed to fetch user files: {e}")
-        return []
-    finally:
-        if cursor: cursor.close()
-        if conn: conn.close()
+        return [], None
 
-def get_file_by_name(user_id, filename):
-    conn = cursor = None
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_history_cursor(rows[-1][2], rows[-1][0]) if has_more else None
+    files = [{"filename": row[1], "created_at": row[2], "size": row[3]} for row in rows]
+    return files, next_cursor
+
+@timed("db.get_file_blob")
+def get_file_blob(user_id, filename):
+    """
+    Return {"hash", "size", "stored_size", "created_at", "data", "compressed"}
+    for a user's file, or None. Blobs that fit in one chunk come back inline;
+    larger ones have data=None and are read by iter_file_content chunk by
+    chunk. Legacy rows (TEXT content, no blob) come back uncompressed.
+    """
     try:
-        conn = get_conn()
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT content FROM user_files
-            WHERE user_id = %s AND filename = %s
-        """, (user_id, filename))
-        row = cursor.fetchone()
-        return row[0] if row else None
+        with db_connection() as conn, conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT f.created_at, f.content, b.hash, b.size, b.stored_size,
+                       CASE WHEN b.stored_size <= %s THEN b.data END
+                FROM user_files f LEFT JOIN file_blobs b ON b.hash = f.blob_hash
+                WHERE f.user_id = %s AND f.filename = %s
+                ORDER BY f.id DESC LIMIT 1
+            """, (FILE_CHUNK_SIZE, user_id, filename))
+            row = cursor.fetchone()
     except Exception as e:
         print(f"❌ Failed to fetch file content: {e}")
         return None
-    finally:
-        if cursor: cursor.close()
-        if conn: conn.close()
+    if not row:
+        return None
+    created_at, content, digest, size, stored_size, data = row
+    if digest is None:
+        if content is None:
+            return None
+        data = content.encode("utf-8")
+        return {"hash": content_hash(data), "size": len(data), "stored_size": len(data),
+                "created_at": created_at, "data": data, "compressed": False}
+    return {"hash": digest, "size": size, "stored_size": stored_size, "created_at": created_at,
+            "data": bytes(data) if data is not None else None, "compressed": True}
+
+def read_blob_chunks(digest, stored_size, chunk_size=FILE_CHUNK_SIZE):
+    """
+    Yield a blob's stored bytes chunk by chunk. Each chunk is its own short
+    pooled query (substring() on EXTERNAL storage reads only the TOAST pages it
+    needs), so a slow client never pins a connection for the whole download.
+    """
+    for offset in range(0, stored_size, chunk_size):
+        with db_connection() as conn, conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT substring(data FROM %s FOR %s) FROM file_blobs WHERE hash = %s",
+                (offset + 1, chunk_size, digest)
+            )
+            row = cursor.fetchone()
+        if row is None:
+            print(f"⚠️ Blob {digest} disappeared mid-download.")
+            return
+        yield bytes(row[0])
+
+def iter_file_content(record, chunk_size=FILE_CHUNK_SIZE):
+    """Yield the file's bytes in chunks of at most `chunk_size`, decompressing incrementally."""
+    if not record["compressed"]:
+        data = record["data"]
+        for start in range(0, len(data), chunk_size):
+            yield data[start:start + chunk_size]
+        return
+
+    if record["data"] is not None:
+        source = [record["data"]]
+    else:
+        source = read_blob_chunks(record["hash"], record["stored_size"], chunk_size)
+    decompressor = zlib.decompressobj()
+    for piece in source:
+        pending = piece
+        while pending:
+            out = decompressor.decompress(pending, chunk_size)
+            pending = decompressor.unconsumed_tail
+            if out:
+                yield out
+    tail = decompressor.flush()
+    if tail:
+        yield tail
+
+def get_file_by_name(user_id, filename):
+    record = get_file_blob(user_id, filename)
+    return b"".join(iter_file_content(record)).decode("utf-8") if record else None
+
+# === File Storage Maintenance ===
+def migrate_files_to_blobs(batch_size=500):
+    """Move legacy TEXT content into file_blobs, one committed batch at a time."""
+    total = 0
+    while True:
+        with db_connection() as conn, conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT id, content FROM user_files
+                WHERE blob_hash IS NULL AND content IS NOT NULL
+                ORDER BY id LIMIT %s FOR UPDATE SKIP LOCKED
+            """, (batch_size,))
+            rows = cursor.fetchall()
+            for file_id, content in rows:
+                digest = store_blob(cursor, content.encode("utf-8"))
+                cursor.execute("UPDATE user_files SET blob_hash = %s, content = NULL WHERE id = %s", (digest, file_id))
+        total += len(rows)
+        if len(rows) < batch_size:
+            break
+    print(f"✅ Moved {total} files into blob storage.")
+    return total
+
+@timed("db.gc_files")
+def gc_files(retention_days=FILE_RETENTION_DAYS, grace_hours=FILE_GC_GRACE_HOURS):
+    """
+    Retention/GC job (run from cron: `python jarvis_db.py gc-files`):
+      1. delete user_files older than `retention_days` (when > 0)
+      2. delete blobs nobody has referenced for `grace_hours`
+    """
+    with db_connection() as conn, conn.cursor() as cursor:
+        released = 0
+        if retention_days > 0:
+            delete_files_where(cursor, "created_at < now() - make_interval(days => %s)", (retention_days,))
+            released = cursor.rowcount
+        cursor.execute("""
+            DELETE FROM file_blobs
+            WHERE refcount <= 0 AND last_referenced < now() - make_interval(hours => %s)
+        """, (grace_hours,))
+        collected = cursor.rowcount
+    print(f"🧹 File GC: released expired references on {released} blobs, deleted {collected} unreferenced blobs.")
+    return released, collected
+
 
+# === CLI: python jarvis_db.py migrate [--drop-username] | migrate-search | migrate-files | gc-files ===
+if __name__ == "__main__":
+    import sys
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command == "migrate":
+        migrate_user_id_keys(drop_username="--drop-username" in sys.argv)
+    elif command == "migrate-search":
+        migrate_chat_search()
+    elif command == "migrate-files":
+        migrate_files_to_blobs()
+    elif command == "gc-files":
+        gc_files()
+    else:
+        print("Usage: python jarvis_db.py migrate [--drop-username] | migrate-search | migrate-files | gc-files")
@@ -65,28 +65,19 @@ async function sendMessage() {
     chatBox.scrollTop = chatBox.scrollHeight;
 
     try {
-        const res = await fetch("/ask", {
-            method: "POST",
-            headers: { "Content-Type": "application/json" },
-            body: JSON.stringify({ message: text })
-        });
-        const data = await res.json();
+        const data = await askStream(text);
         updateTypingIndicator(data.response);
+        if (data.failed) return;
+        if (data.saved === false) {
+            appendBotMessage("⚠️ This reply could not be saved to your history.");
+        }
 
         const lower = data.response.toLowerCase();
         const isAutomation = ["opening", "launching", "muting", "closing", "setting reminder", "volume", "brightness"]
             .some(kw => lower.includes(kw));
 
         if (!audioMuted && !isAutomation) {
-            const tts = await fetch("/speak", {
-                method: "POST",
-                headers: { "Content-Type": "application/json" },
-                body: JSON.stringify({ text: data.response })
-            });
-            if (tts.ok) {
-                const blob = await tts.blob();
-                new Audio(URL.createObjectURL(blob)).play();
-            }
+            await speakResponse(data.response);
         }
     } catch {
         document.getElementById("typing-indicator")?.remove();
@@ -95,6 +86,107 @@ async function sendMessage() {
     chatBox.scrollTop = chatBox.scrollHeight;
 }
 
+// === Speech Playback ===
+async function speakResponse(text) {
+    if (!window.MediaSource || !MediaSource.isTypeSupported("audio/mpeg")) {
+        return speakBuffered(text);
+    }
+    const res = await fetch("/speak/stream", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ text })
+    });
+    if (!res.ok || !res.body) return;
+
+    // Play through MediaSource so audio starts while synthesis continues
+    const mediaSource = new MediaSource();
+    const audio = new Audio(URL.createObjectURL(mediaSource));
+    mediaSource.addEventListener("sourceopen", async () => {
+        const buffer = mediaSource.addSourceBuffer("audio/mpeg");
+        const reader = res.body.getReader();
+        let started = false;
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            await new Promise(resolve => {
+                buffer.addEventListener("updateend", resolve, { once: true });
+                buffer.appendBuffer(value);
+            });
+            if (!started) {
+                started = true;
+                audio.play().catch(() => {});
+            }
+        }
+        if (mediaSource.readyState === "open") mediaSource.endOfStream();
+    }, { once: true });
+}
+
+async function speakBuffered(text) {
+    const tts = await fetch("/speak", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ text })
+    });
+    if (tts.ok) {
+        const blob = await tts.blob();
+        new Audio(URL.createObjectURL(blob)).play();
+    }
+}
+
+// === Streaming Ask (Server-Sent Events over fetch) ===
+async function askStream(text) {
+    const res = await fetch("/ask/stream", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ message: text })
+    });
+    if (!res.ok || !res.body) {
+        // Errors (401, 429, ...) come back as plain JSON instead of an event stream
+        const data = await res.json().catch(() => ({}));
+        return {
+            ...data,
+            response: data.response || data.message || "❌ Failed to connect to server.",
+            failed: !res.ok
+        };
+    }
+
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    let partial = "";
+    let final = null;
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let sep;
+        while ((sep = buffer.indexOf("\n\n")) !== -1) {
+            const raw = buffer.slice(0, sep);
+            buffer = buffer.slice(sep + 2);
+
+            let event = "message", payload = "";
+            raw.split("\n").forEach(line => {
+                if (line.startsWith("event: ")) event = line.slice(7);
+                else if (line.startsWith("data: ")) payload += line.slice(6);
+            });
+            if (!payload) continue;
+            const data = JSON.parse(payload);
+
+            if (event === "delta") {
+                partial += data.text;
+                const el = document.getElementById("typing-indicator");
+                if (el) el.innerHTML = `<b>Jarvis:</b> ${escapeHtml(partial)}`;
+                chatBox.scrollTop = chatBox.scrollHeight;
+            } else if (event === "done") {
+                final = data;
+            }
+        }
+    }
+    return final || { response: partial };
+}
+
 function appendUserMessage(txt) {
     const d = document.createElement("div");
     d.className = "user-message";
@@ -117,6 +209,43 @@ function updateTypingIndicator(txt) {
     }
 }
 
+// === Lazy-load Older History ===
+let historyCursor = chatBox.dataset.historyCursor || null;
+let historyLoading = false;
+
+async function loadOlderHistory() {
+    if (!historyCursor || historyLoading) return;
+    historyLoading = true;
+    try {
+        const res = await fetch(`/history?before=${encodeURIComponent(historyCursor)}&limit=50`);
+        if (!res.ok) return;
+        const data = await res.json();
+        const prevHeight = chatBox.scrollHeight;
+        const frag = document.createDocumentFragment();
+        data.messages.forEach(m => {
+            const u = document.createElement("div");
+            u.className = "user-message";
+            u.innerHTML = `<b>You:</b> ${escapeHtml(m.message)}<div class="timestamp">${m.timestamp}</div>`;
+            const b = document.createElement("div");
+            b.className = "bot-message";
+            b.innerHTML = `<b>Jarvis:</b> ${m.response}<div class="timestamp">${m.timestamp}</div>`;
+            frag.appendChild(u);
+            frag.appendChild(b);
+        });
+        chatBox.insertBefore(frag, chatBox.firstChild);
+        chatBox.scrollTop += chatBox.scrollHeight - prevHeight;
+        historyCursor = data.next_cursor;
+    } catch {
+        // Keep the cursor so the next scroll retries
+    } finally {
+        historyLoading = false;
+    }
+}
+
+chatBox.addEventListener("scroll", () => {
+    if (chatBox.scrollTop < 80) loadOlderHistory();
+});
+
 function escapeHtml(s) {
     return s.replace(/&/g, "&amp;")
             .replace(/</g, "&lt;")